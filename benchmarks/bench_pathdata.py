@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Benchmark compact path data encoding on the demo charts
+
+Compares the size of all `d` attributes and the drawing throughput of full-precision
+path data against PathBuilder output at a few precisions.
+
+Usage: python benchmarks/bench_pathdata.py [--repeat N]
+
+:copyright: (c) 2021 Le Tuan Anh <tuananh.ke@gmail.com>
+:license: MIT, see LICENSE for more details.
+'''
+
+import io
+import sys
+import argparse
+import math
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from pyinkscape import Canvas, PieChart, LineChart  # noqa: E402
+
+
+def draw_demo_pie(precision):
+    ''' The pie chart of demo_piechart.py '''
+    c = Canvas()
+    pie = PieChart(c.layer('Layer 1'), center=(200, 200), radius=(150, 150), precision=precision)
+    pie.slide(23, 2, 12, 43, 9, 11)
+    pie.render()
+    return c
+
+
+def draw_demo_pies(precision, count=2000):
+    ''' A dashboard grid of mini pies '''
+    c = Canvas()
+    layer = c.layer('Layer 1')
+    for idx in range(count):
+        pie = PieChart(layer, center=(10 + (idx % 50) * 16, 10 + (idx // 50) * 16), radius=(7, 7), precision=precision)
+        pie.slide(*(((idx * k) % 7) + 1 for k in range(1, 6)))
+        pie.render()
+    return c
+
+
+def draw_demo_series(precision, samples=20000):
+    ''' A noisy time series drawn without decimation '''
+    c = Canvas()
+    ys = [math.sin(x / 50) * 80 + math.sin(x * 7.3) * 5 for x in range(samples)]
+    LineChart(c.layer('Layer 1'), (10, 10, 780, 300), ys, precision=15 if precision is None else precision).render()
+    return c
+
+
+def path_bytes(canvas):
+    return sum(len(e.get('d', '')) for e in canvas.layer('Layer 1').elem.iter() if e.get('d'))
+
+
+def run(repeat=3):
+    cases = [('demo pie', draw_demo_pie), ('2000 mini pies', draw_demo_pies), ('20k-sample series', draw_demo_series)]
+    print(f"{'chart':<20} {'precision':>9} {'d bytes':>12} {'saved':>8} {'draw (s)':>10} {'write (s)':>10}")
+    for name, draw in cases:
+        baseline = None
+        for precision in (None, 3, 2, 1):
+            elapsed = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                canvas = draw(precision)
+                elapsed.append(time.perf_counter() - start)
+            written = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                canvas.write(io.BytesIO())
+                written.append(time.perf_counter() - start)
+            size = path_bytes(canvas)
+            baseline = baseline or size
+            _label = 'full' if precision is None else str(precision)
+            print(f"{name:<20} {_label:>9} {size:>12,} {1 - size / baseline:>8.1%} {min(elapsed):>10.4f} {min(written):>10.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark compact path data encoding")
+    parser.add_argument('--repeat', type=int, default=3, help="Number of runs per case (the best run is reported)")
+    args = parser.parse_args()
+    run(repeat=args.repeat)
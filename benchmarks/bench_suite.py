@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+'''
+pytest-benchmark runners for the benchmark suite
+
+Usage: python -m pytest benchmarks/bench_suite.py [--benchmark-json=results.json]
+
+Set PYINKSCAPE_XML_BACKEND=etree to benchmark the ElementTree backend.
+Without pytest-benchmark each case is simply run once.
+
+:copyright: (c) 2021 Le Tuan Anh <tuananh.ke@gmail.com>
+:license: MIT, see LICENSE for more details.
+'''
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import suite  # noqa: E402
+import synthetic  # noqa: E402
+
+SIZES = ('1KB', '100KB', '1MB')
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+    @pytest.fixture
+    def benchmark():
+        return lambda func, *args, **kwargs: func(*args, **kwargs)
+
+
+@pytest.fixture(scope='module', params=SIZES)
+def svg_path(request, tmp_path_factory):
+    path = tmp_path_factory.mktemp('synthetic') / f"synthetic_{request.param}.svg"
+    synthetic.generate_svg(path, synthetic.parse_size(request.param))
+    return str(path)
+
+
+@pytest.mark.parametrize('name', [n for n, (_, per_size) in suite.CASES.items() if per_size])
+def test_document(benchmark, name, svg_path, tmp_path):
+    benchmark(suite.CASES[name][0](svg_path, str(tmp_path)))
+
+
+@pytest.mark.parametrize('name', [n for n, (_, per_size) in suite.CASES.items() if not per_size])
+def test_drawing(benchmark, name, tmp_path):
+    benchmark(suite.CASES[name][0](str(tmp_path)))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Run the pyinkscape benchmark suite and compare results between commits
+
+Each XML backend runs in its own process (lxml is disabled with PYINKSCAPE_XML_BACKEND=etree).
+
+Usage:
+    python benchmarks/run.py --sizes 1KB 1MB --backend both --output results.json
+    python benchmarks/run.py --compare results.json --threshold 0.2
+
+:copyright: (c) 2021 Le Tuan Anh <tuananh.ke@gmail.com>
+:license: MIT, see LICENSE for more details.
+'''
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+DEFAULT_SIZES = ('1KB', '100KB', '1MB', '10MB', '100MB')
+
+
+def run_worker(args):
+    ''' Run all cases on the backend of the current process and print JSON results '''
+    import suite
+    import synthetic
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        svg_files = []
+        for size in args.sizes:
+            svg_path = os.path.join(tmp_dir, f"synthetic_{size}.svg")
+            synthetic.generate_svg(svg_path, synthetic.parse_size(size))
+            svg_files.append((size, svg_path))
+        for name, (_, per_size) in suite.CASES.items():
+            if args.cases and name not in args.cases:
+                continue
+            for size, svg_path in (svg_files if per_size else [(None, None)]):
+                print(f"[{suite.backend()}] {name} {size or ''}", file=sys.stderr)
+                timing = suite.run_case(name, tmp_dir, svg_path=svg_path, repeat=args.repeat)
+                results.append(dict(backend=suite.backend(), case=name, size=size, **timing))
+    json.dump(results, sys.stdout)
+
+
+def spawn(backend, args):
+    env = dict(os.environ, PYINKSCAPE_XML_BACKEND=backend)
+    cmd = [sys.executable, __file__, '--worker', '--repeat', str(args.repeat), '--sizes', *args.sizes]
+    if args.cases:
+        cmd += ['--cases', *args.cases]
+    output = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, check=True)
+    results = json.loads(output.stdout)
+    if results and results[0]['backend'] != backend:
+        print(f"WARNING: backend {backend} is not available, results were measured with {results[0]['backend']}", file=sys.stderr)
+        return []
+    return results
+
+
+def _key(result):
+    return (result['backend'], result['case'], result['size'])
+
+
+def compare(results, baseline, threshold):
+    ''' Print the speed ratio of each case against a baseline and return the regressed cases '''
+    _baseline = {_key(r): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        base = _baseline.get(_key(result))
+        if not base or not base['median']:
+            continue
+        ratio = result['median'] / base['median']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'REGRESSION'
+            regressions.append(result)
+        elif ratio < 1 - threshold:
+            flag = 'faster'
+        print(f"{result['backend']:<6} {result['case']:<18} {result['size'] or '-':>6} {base['median']:>10.4f} {result['median']:>10.4f} {ratio:>7.2f}x {flag}")
+    return regressions
+
+
+def report(results):
+    print(f"{'backend':<6} {'case':<18} {'size':>6} {'min (s)':>10} {'median (s)':>10}")
+    for result in results:
+        print(f"{result['backend']:<6} {result['case']:<18} {result['size'] or '-':>6} {result['min']:>10.4f} {result['median']:>10.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pyinkscape hot paths")
+    parser.add_argument('--sizes', nargs='+', default=list(DEFAULT_SIZES), help="Synthetic SVG sizes (e.g. 1KB 10MB)")
+    parser.add_argument('--backend', choices=('lxml', 'etree', 'both'), default='both')
+    parser.add_argument('--cases', nargs='*', help="Only run these cases")
+    parser.add_argument('--repeat', type=int, default=5, help="Number of runs per case")
+    parser.add_argument('--output', help="Write results to a JSON file")
+    parser.add_argument('--compare', help="Compare with the results of a previous run (JSON)")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Relative slowdown reported as a regression")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return run_worker(args)
+    backends = ('lxml', 'etree') if args.backend == 'both' else (args.backend,)
+    results = [r for backend in backends for r in spawn(backend, args)]
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(), 'results': results}, outfile, indent=2)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+    else:
+        report(results)
+
+
+if __name__ == "__main__":
+    main()
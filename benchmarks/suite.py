@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+'''
+Benchmark cases for the load, query, draw, serialize and convert hot paths
+
+Each case is a setup function that prepares its inputs and returns the callable to time.
+Cases marked `per_size` take the path to a synthetic SVG (see :mod:`synthetic`).
+
+:copyright: (c) 2021 Le Tuan Anh <tuananh.ke@gmail.com>
+:license: MIT, see LICENSE for more details.
+'''
+
+import os
+import sys
+import statistics
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from pyinkscape import Canvas, PieChart  # noqa: E402
+from pyinkscape import inkscape  # noqa: E402
+from pyinkscape import render as _render  # noqa: E402
+
+FAKE_INKSCAPE = [sys.executable, str(ROOT_DIR / 'test' / 'data' / 'fake_inkscape.py')]
+DRAW_COUNT = 1000
+LOOKUP_COUNT = 100
+CASES = {}
+
+
+def backend():
+    ''' Name of the XML backend pyinkscape is running on '''
+    return 'lxml' if inkscape._LXML_AVAILABLE else 'etree'
+
+
+def case(name, per_size=False):
+    def _register(setup):
+        CASES[name] = (setup, per_size)
+        return setup
+    return _register
+
+
+@case('load', per_size=True)
+def bench_load(svg_path, tmp_dir):
+    return lambda: Canvas(svg_path, use_cache=False)
+
+
+@case('load_cached', per_size=True)
+def bench_load_cached(svg_path, tmp_dir):
+    Canvas(svg_path)  # warm the template cache
+    return lambda: Canvas(svg_path)
+
+
+@case('copy', per_size=True)
+def bench_copy(svg_path, tmp_dir):
+    c = Canvas(svg_path)
+    return c.copy
+
+
+@case('reparse', per_size=True)
+def bench_reparse(svg_path, tmp_dir):
+    ''' Cloning a canvas by serializing and parsing it again (what copy() replaces) '''
+    c = Canvas(svg_path)
+    return lambda: Canvas._from_tree(inkscape._parse_svg_bytes(c.to_xml_string().encode('utf-8')))
+
+
+@case('groups', per_size=True)
+def bench_groups(svg_path, tmp_dir):
+    c = Canvas(svg_path)
+    return c.groups
+
+
+@case('group_lookup', per_size=True)
+def bench_group_lookup(svg_path, tmp_dir):
+    c = Canvas(svg_path)
+    count = len(c.groups()) - len(c.layers())
+    names = [f"group {(idx * 7919) % count}" for idx in range(LOOKUP_COUNT)]
+
+    def _lookup():
+        for name in names:
+            c.group(name)
+    return _lookup
+
+
+@case('find', per_size=True)
+def bench_find(svg_path, tmp_dir):
+    c = Canvas(svg_path)
+    layers = [layer.label for layer in c.layers()]
+    count = len(c.groups()) - len(layers)
+    names = [f"group {(idx * 7919) % count}" for idx in range(LOOKUP_COUNT)]
+
+    def _find():
+        for name in names:
+            c.find('g', label=name)
+        for label in layers:
+            c.find('text', layer=label)
+    return _find
+
+
+@case('to_xml_string', per_size=True)
+def bench_to_xml_string(svg_path, tmp_dir):
+    c = Canvas(svg_path)
+    return c.to_xml_string
+
+
+@case('render', per_size=True)
+def bench_render(svg_path, tmp_dir):
+    c = Canvas(svg_path)
+    outpath = os.path.join(tmp_dir, 'render.svg')
+    return lambda: c.render(outpath, overwrite=True)
+
+
+@case('draw_circle')
+def bench_draw_circle(tmp_dir):
+    def _draw():
+        layer = Canvas().layer('Layer 1')
+        for idx in range(DRAW_COUNT):
+            layer.circle((idx % 100, idx // 100), 2)
+    return _draw
+
+
+@case('draw_text')
+def bench_draw_text(tmp_dir):
+    def _draw():
+        layer = Canvas().layer('Layer 1')
+        for idx in range(DRAW_COUNT):
+            layer.text(f"Label {idx}", (idx % 100, idx // 100))
+    return _draw
+
+
+@case('draw_path')
+def bench_draw_path(tmp_dir):
+    def _draw():
+        layer = Canvas().layer('Layer 1')
+        for idx in range(DRAW_COUNT):
+            layer.path(f"M {idx % 100} {idx // 100} l 10 5 z")
+    return _draw
+
+
+@case('draw_circles_bulk')
+def bench_draw_circles_bulk(tmp_dir):
+    centers = [(idx % 100, idx // 100) for idx in range(DRAW_COUNT)]
+
+    def _draw():
+        Canvas().layer('Layer 1').circles(centers, 2)
+    return _draw
+
+
+@case('piechart_render')
+def bench_piechart_render(tmp_dir):
+    def _draw():
+        layer = Canvas().layer('Layer 1')
+        for idx in range(100):
+            pie = PieChart(layer, center=(10 + (idx % 10) * 20, 10 + (idx // 10) * 20), radius=(8, 8))
+            pie.slide(*(((idx * k) % 7) + 1 for k in range(1, 6)))
+            pie.render()
+    return _draw
+
+
+@case('svg_to_pdf')
+def bench_svg_to_pdf(tmp_dir):
+    svg_path = os.path.join(tmp_dir, 'convert.svg')
+    Canvas().render(svg_path, overwrite=True)
+    return lambda: _render.svg_to_pdf(svg_path, overwrite=True, inkscape_path=FAKE_INKSCAPE)
+
+
+def measure(func, repeat=5):
+    ''' Call `func` `repeat` times and summarize the timings in seconds '''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {'min': min(timings), 'median': statistics.median(timings),
+            'mean': statistics.fmean(timings), 'repeat': repeat}
+
+
+def run_case(name, tmp_dir, svg_path=None, repeat=5):
+    setup, per_size = CASES[name]
+    func = setup(svg_path, tmp_dir) if per_size else setup(tmp_dir)
+    return measure(func, repeat=repeat)
+
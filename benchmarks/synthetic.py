@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Synthetic Inkscape SVG documents for benchmarking
+
+:copyright: (c) 2021 Le Tuan Anh <tuananh.ke@gmail.com>
+:license: MIT, see LICENSE for more details.
+'''
+
+import re
+
+_HEADER = '''<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<svg
+   xmlns:dc="http://purl.org/dc/elements/1.1/"
+   xmlns:cc="http://creativecommons.org/ns#"
+   xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+   xmlns:svg="http://www.w3.org/2000/svg"
+   xmlns="http://www.w3.org/2000/svg"
+   xmlns:sodipodi="http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd"
+   xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape"
+   width="210mm"
+   height="297mm"
+   viewBox="0 0 840 1188"
+   version="1.1"
+   id="svg8"
+   inkscape:version="1.0.1 (3bc2e813f5, 2020-09-07)"
+   sodipodi:docname="synthetic.svg">
+'''
+_LAYER = '''  <g inkscape:label="Layer {layer}" inkscape:groupmode="layer" id="layer{layer}">
+'''
+_GROUP = '''    <g inkscape:label="group {group}" id="g{group}">
+      <circle id="c{group}" cx="{x}" cy="{y}" r="3" style="fill:#0072B2;stroke:none" />
+      <path id="p{group}" d="M {x} {y} L {x2} {y2} Z" style="fill:none;stroke:#D55E00;stroke-width:1px" />
+      <text id="t{group}" x="{x}" y="{y}"><tspan id="ts{group}">Label {group}</tspan></text>
+    </g>
+'''
+_LAYER_END = '''  </g>
+'''
+_FOOTER = '''</svg>
+'''
+GROUPS_PER_LAYER = 100
+SIZES = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+def parse_size(text):
+    ''' Parse a size such as "100KB" or "1MB" into a number of bytes '''
+    m = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]B)?\s*', text.upper())
+    if not m:
+        raise ValueError(f"Invalid size: {text}")
+    return int(float(m.group(1)) * SIZES.get(m.group(2), 1))
+
+
+def generate_svg(path, size):
+    ''' Write a synthetic Inkscape document of about `size` bytes (at least one layer and one group)
+
+    Every group has a label ("group N") and contains a circle, a path and a text.
+    Groups are split into layers ("Layer N") of 100 groups each.
+
+    :returns: The number of groups in the document
+    '''
+    _size = len(_HEADER) + len(_FOOTER)
+    group = 0
+    with open(path, 'w', encoding='utf-8') as outfile:
+        outfile.write(_HEADER)
+        while True:
+            if group % GROUPS_PER_LAYER == 0:
+                if group:
+                    outfile.write(_LAYER_END)
+                _layer = _LAYER.format(layer=group // GROUPS_PER_LAYER + 1)
+                outfile.write(_layer)
+                _size += len(_layer) + len(_LAYER_END)
+            x, y = (group * 7) % 800, (group * 13) % 1100
+            _group = _GROUP.format(group=group, x=x, y=y, x2=x + 20, y2=y + 10)
+            outfile.write(_group)
+            _size += len(_group)
+            group += 1
+            if _size >= size:
+                break
+        outfile.write(_LAYER_END)
+        outfile.write(_FOOTER)
+    return group
@@ -43,7 +43,6 @@ print("-" * 60)
 print("pyInkscape demo pie chart code")
 print("-" * 60)
 print(f"lxml available: {pyinkscape.inkscape._LXML_AVAILABLE}")
-print(f"chirptext available: {pyinkscape.inkscape._CHIRPTEXT_AVAILABLE}")
 print()
 
 # ------------------------------------------------------------------------------
@@ -2,10 +2,28 @@ from . import __version__ as version_info
 from .__version__ import __author__, __email__, __copyright__, __maintainer__
 from .__version__ import __credits__, __license__, __description__, __url__
 from .__version__ import __version_major__, __version_long__, __version__, __status__
-from .inkscape import Canvas, Point, Dimension, Style
-from .charts import PieChart
-from .styles import DEFAULT_LINESTYLE, STYLE_FPNAME, BLIND_COLORS
 
 
-__all__ = ['Canvas', 'PieChart', 'Point', 'Style',
+__all__ = ['Canvas', 'PieChart', 'LineChart', 'BarChart', 'ScatterChart', 'Point', 'Style', 'FrozenStyle',
            'DEFAULT_LINESTYLE', 'STYLE_FPNAME', 'BLIND_COLORS']
+
+# Public names are imported from their modules on first access, so `import pyinkscape`
+# does not load the XML backend (lxml) or any other optional dependency
+_LAZY_EXPORTS = {
+    'Canvas': 'inkscape', 'Point': 'inkscape', 'Dimension': 'inkscape', 'Style': 'inkscape', 'FrozenStyle': 'inkscape',
+    'PieChart': 'charts', 'LineChart': 'charts', 'BarChart': 'charts', 'ScatterChart': 'charts',
+    'DEFAULT_LINESTYLE': 'styles', 'STYLE_FPNAME': 'styles', 'BLIND_COLORS': 'styles',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        import importlib
+        value = getattr(importlib.import_module(f".{_LAZY_EXPORTS[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+asyncio API for rendering and converting documents
+
+Latest version can be found at https://github.com/letuananh/pyinkscape
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+@license: MIT
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+########################################################################
+
+import asyncio
+import functools
+import logging
+import os
+
+from . import instrument
+from .render import INKSCAPE_PATH, ConversionResult
+from .render import _inkscape_command, _output_path, _unlink_shared_output, is_up_to_date
+from . import render as _render
+
+
+def getLogger():
+    return logging.getLogger(__name__)
+
+
+async def _terminate(proc):
+    ''' Kill a subprocess and reap it, even if the calling task is being cancelled '''
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+    await asyncio.shield(proc.wait())
+
+
+async def svg_export(filename, output_path=None, export_type="pdf", inkscape_path=INKSCAPE_PATH,
+                     export_area_drawing=True, timeout=None):
+    ''' Export an SVG file using Inkscape without blocking the event loop (see :func:`pyinkscape.render.svg_export`)
+
+    When the calling task is cancelled, the Inkscape process is killed.
+
+    :param timeout: Maximum number of seconds for the export, the process is killed when exceeded
+    :returns: A :class:`ConversionResult`
+    '''
+    if output_path is None:
+        output_path = _output_path(filename, export_type)
+    _args = _inkscape_command(inkscape_path) + [f"{filename}", f"--export-filename={output_path}"]
+    if export_area_drawing:
+        _args.append("--export-area-drawing")
+    _unlink_shared_output(output_path)
+    with instrument.timed('inkscape.export', source=str(filename)):
+        try:
+            proc = await asyncio.create_subprocess_exec(*_args, stdout=asyncio.subprocess.DEVNULL,
+                                                        stderr=asyncio.subprocess.PIPE)
+        except OSError as e:
+            return ConversionResult(filename, output_path, ok=False, error=str(e))
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            await _terminate(proc)
+            return ConversionResult(filename, output_path, ok=False, error=f"Inkscape did not finish within {timeout} seconds")
+        except BaseException:
+            # cancelled
+            await _terminate(proc)
+            raise
+    if proc.returncode != 0:
+        _error = stderr.decode('utf-8', errors='replace').strip()
+        return ConversionResult(filename, output_path, ok=False,
+                                error=f"Abnomal Inkscape exit code: {proc.returncode}" + (f" ({_error})" if _error else ""))
+    return ConversionResult(filename, output_path)
+
+
+async def svg_to_pdf(filename, overwrite=False, inkscape_path=INKSCAPE_PATH, timeout=None):
+    ''' Convert an SVG file into PDF using Inkscape without blocking the event loop '''
+    pdf_file = _output_path(filename, "pdf")
+    if not overwrite and pdf_file.exists():
+        getLogger().warning(f"WARNING: File {pdf_file} exists. SKIPPED")
+        return ConversionResult(filename, pdf_file, skipped=True)
+    result = await svg_export(filename, pdf_file, inkscape_path=inkscape_path, timeout=timeout)
+    if not result.ok:
+        getLogger().warning(result.error)
+    return result
+
+
+class AsyncConverter:
+
+    ''' Run Inkscape exports from asyncio code with at most `workers` processes at a time
+
+    >>> converter = AsyncConverter(workers=4, timeout=60)
+    >>> results = await converter.convert_many(svg_files, formats=('pdf', 'png'))
+    '''
+
+    def __init__(self, workers=None, inkscape_path=INKSCAPE_PATH, timeout=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.inkscape_path = inkscape_path
+        self.timeout = timeout
+        self.__semaphore = None
+
+    @property
+    def _semaphore(self):
+        # created on first use so that it belongs to the running event loop
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.workers)
+        return self.__semaphore
+
+    async def export(self, filename, output_path=None, export_type="pdf", export_area_drawing=True):
+        ''' Export one SVG file, waiting for a free slot first '''
+        async with self._semaphore:
+            return await svg_export(filename, output_path, export_type=export_type, inkscape_path=self.inkscape_path,
+                                    export_area_drawing=export_area_drawing, timeout=self.timeout)
+
+    async def convert_many(self, filenames, formats=("pdf",), overwrite=False, on_progress=None):
+        ''' Convert many SVG files concurrently (see :func:`pyinkscape.render.svg_to_pdf_many`)
+
+        Cancelling this coroutine cancels all pending exports and kills running Inkscape processes.
+
+        :param on_progress: Callback `on_progress(result, done, total)`, called after each output
+        :returns: A list of :class:`ConversionResult` objects, ordered by input file and then by format
+        '''
+        jobs = [(filename, _output_path(filename, export_type)) for filename in filenames for export_type in formats]
+        total = len(jobs)
+        done = 0
+
+        async def _convert(filename, output_path):
+            nonlocal done
+            if not overwrite and is_up_to_date(filename, output_path):
+                result = ConversionResult(filename, output_path, skipped=True)
+            else:
+                result = await self.export(filename, output_path)
+                if not result.ok:
+                    getLogger().warning(f"Could not convert {result.source}: {result.error}")
+            done += 1
+            if on_progress:
+                on_progress(result, done, total)
+            return result
+        return list(await asyncio.gather(*(_convert(f, o) for f, o in jobs)))
+
+
+async def render(canvas, outpath, overwrite=False, encoding="utf-8", executor=None):
+    ''' Serialize and write a canvas in a worker thread (see :meth:`Canvas.render`)
+
+    :param executor: A concurrent.futures executor, default to the event loop's default executor
+    '''
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(executor, functools.partial(canvas.render, outpath, overwrite=overwrite, encoding=encoding))
+
+
+async def merge_pdf(output_path, input_paths, executor=None, **kwargs):
+    ''' Merge PDF files in a worker thread (see :func:`pyinkscape.render.merge_pdf`)
+
+    :returns: A :class:`pyinkscape.render.MergeStats` object
+    '''
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(_render.merge_pdf, output_path, input_paths, **kwargs))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+Generate many documents from one template in worker processes
+
+Latest version can be found at https://github.com/letuananh/pyinkscape
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+@license: MIT
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+########################################################################
+
+import io
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .inkscape import Canvas, SequentialIDAllocator
+from .inkscape import _parse_svg_bytes, _copy_tree
+
+
+def getLogger():
+    return logging.getLogger(__name__)
+
+
+class GenerationResult:
+
+    ''' Outcome of generating one document '''
+
+    def __init__(self, index, output, ok=True, skipped=False, error=None, conversion=None):
+        self.index = index
+        self.output = output
+        self.ok = ok
+        self.skipped = skipped
+        self.error = error
+        self.conversion = conversion  # a ConversionResult when the SVG was converted
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        _status = "skipped" if self.skipped else ("ok" if self.ok else f"failed: {self.error}")
+        return f"GenerationResult(#{self.index} -> {self.output}, {_status})"
+
+
+# Per-process state of the workers, set once by _init_worker
+_worker_template = None
+_worker_options = None
+
+
+def _init_worker(template_bytes, options):
+    ''' Parse the serialized template once per worker process '''
+    global _worker_template, _worker_options
+    _worker_template = _parse_svg_bytes(template_bytes) if template_bytes is not None else None
+    _worker_options = options
+
+
+def _output_path(output_path, index, record):
+    if callable(output_path):
+        return Path(output_path(index, record))
+    return Path(str(output_path).format(index=index, record=record))
+
+
+def _generate_one(task):
+    index, record = task
+    options = _worker_options
+    output = _output_path(options['output_path'], index, record)
+    if not options['overwrite'] and output.exists():
+        return GenerationResult(index, output, skipped=True)
+    try:
+        canvas = Canvas._from_tree(_copy_tree(_worker_template), filepath=options['template_name'],
+                                   id_allocator=SequentialIDAllocator(options['id_seed']))
+        options['build_fn'](canvas, record)
+        canvas.render(output, overwrite=True)
+    except Exception as e:
+        getLogger().exception(f"Could not generate document #{index}")
+        return GenerationResult(index, output, ok=False, error=f"{type(e).__name__}: {e}")
+    result = GenerationResult(index, output)
+    if options['to_pdf']:
+        from .render import svg_export
+        result.conversion = svg_export(output, export_type="pdf", inkscape_path=options['inkscape_path'])
+        if not result.conversion.ok:
+            result.ok = False
+            result.error = result.conversion.error
+    return result
+
+
+def _template_bytes(template):
+    if isinstance(template, Canvas):
+        buf = io.BytesIO()
+        template.write(buf, pretty_print=False)
+        return buf.getvalue(), Canvas.FILEPATH_MEMORY
+    return Path(template).read_bytes(), str(template)
+
+
+def generate_many(template, records, build_fn, output_path, workers=None, to_pdf=False,
+                  overwrite=False, id_seed=1, inkscape_path=None, chunksize=1):
+    ''' Generate one SVG document per record from a shared template
+
+    The template is serialized once and parsed once in each worker process. For each record,
+    a copy of the template is passed to `build_fn(canvas, record)` and written with :meth:`Canvas.render`.
+    Every document gets its own :class:`SequentialIDAllocator`, so generated IDs only depend on
+    the document content and not on the worker that produced it.
+
+    >>> def build(canvas, record):
+    ...     canvas.layer('Layer 1').text(record['name'], (100, 100))
+    >>> generate_many('template.svg', people, build, 'output/{index}.svg', workers=4, to_pdf=True)
+
+    :param template: Path to an SVG file or a :class:`Canvas`
+    :param records: An iterable of records (must be picklable when workers > 1)
+    :param build_fn: A module-level function `build_fn(canvas, record)`
+    :param output_path: A format string with `{index}` and `{record}` fields, or a callable `output_path(index, record)`
+    :param workers: Number of worker processes, default to the number of CPUs. Use 1 to generate in this process.
+    :param overwrite: Regenerate documents whose output files exist (they are skipped otherwise)
+    :param to_pdf: Also convert each SVG file into PDF using Inkscape
+    :param id_seed: First ID number of every document
+    :param inkscape_path: Path to Inkscape binary, default to :data:`pyinkscape.render.INKSCAPE_PATH`
+    :param chunksize: Number of records sent to a worker at once
+    :returns: A list of :class:`GenerationResult` objects in record order
+    '''
+    if to_pdf and inkscape_path is None:
+        from .render import INKSCAPE_PATH
+        inkscape_path = INKSCAPE_PATH
+    template_bytes, template_name = _template_bytes(template)
+    options = {'build_fn': build_fn, 'output_path': output_path, 'overwrite': overwrite, 'id_seed': id_seed,
+               'to_pdf': to_pdf, 'inkscape_path': inkscape_path, 'template_name': template_name}
+    tasks = enumerate(records)
+    workers = max(1, workers or os.cpu_count() or 1)
+    if workers == 1:
+        _init_worker(template_bytes, options)
+        try:
+            return [_generate_one(task) for task in tasks]
+        finally:
+            _init_worker(None, None)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(template_bytes, options)) as executor:
+        return list(executor.map(_generate_one, tasks, chunksize=chunksize))
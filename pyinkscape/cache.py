@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+Content-addressed cache of Inkscape conversion outputs
+
+Latest version can be found at https://github.com/letuananh/pyinkscape
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+@license: MIT
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+########################################################################
+
+import os
+import hashlib
+import json
+import logging
+import shutil
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+
+MAX_REMEMBERED_DIGESTS = 65536
+
+
+def getLogger():
+    return logging.getLogger(__name__)
+
+
+def _default_cache_dir():
+    _base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(_base) / 'pyinkscape' / 'conversions'
+
+
+class CacheStats:
+
+    ''' Statistics of a :class:`ConversionCache` '''
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.unchanged_writes = 0  # Canvas.render() calls that kept an identical file
+
+    @property
+    def hit_rate(self):
+        _total = self.hits + self.misses
+        return self.hits / _total if _total else 0.0
+
+    def __repr__(self):
+        return (f"CacheStats(hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate:.1%}, "
+                f"stores={self.stores}, evictions={self.evictions}, unchanged_writes={self.unchanged_writes})")
+
+
+class ConversionCache:
+
+    ''' An on-disk store of conversion outputs keyed by SVG content, export options and Inkscape version
+
+    Outputs are stored as `<directory>/<key[:2]>/<key>.<export_type>`. When the store grows beyond
+    `max_bytes`, least recently used entries (by modification time, which is updated on every hit)
+    are evicted.
+
+    >>> cache = ConversionCache(max_bytes=2 * 1024 ** 3)
+    >>> canvas.render("chart.svg", overwrite=True, cache=cache)  # keeps the file if nothing changed
+    >>> svg_to_pdf("chart.svg", overwrite=True, cache=cache)     # copies the cached PDF if available
+    >>> cache.stats
+    '''
+
+    def __init__(self, directory=None, max_bytes=1024 ** 3, hardlink=False):
+        '''
+        :param directory: Cache directory, default to ~/.cache/pyinkscape/conversions
+        :param max_bytes: Maximum total size of cached outputs
+        :param hardlink: Hardlink cached outputs instead of copying them (outputs must not be modified in place)
+        '''
+        self.directory = Path(directory) if directory is not None else _default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hardlink = hardlink
+        self.stats = CacheStats()
+        self.__size = None  # total size of cached outputs, computed on first store
+        self.__versions = {}  # (inkscape command, binary mtime) -> version string
+        self.__digests = {}  # (path, size, mtime_ns) -> SHA-256 of the file content
+        self.__lock = threading.Lock()
+
+    # --------------------------------------------------------------------------
+    # Keys
+    # --------------------------------------------------------------------------
+
+    def inkscape_version(self, inkscape_path):
+        ''' Get the version string of an Inkscape binary (cached until the binary changes), or None if it cannot run '''
+        from .render import _inkscape_command
+        _cmd = _inkscape_command(inkscape_path)
+        try:
+            _stat = os.stat(_cmd[-1])
+            _memo_key = (tuple(_cmd), _stat.st_mtime_ns, _stat.st_size)
+        except OSError:
+            _memo_key = (tuple(_cmd), None, None)
+        if _memo_key not in self.__versions:
+            try:
+                output = subprocess.run(_cmd + ["--version"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                _version = output.stdout.decode('utf-8', errors='replace').strip() if output.returncode == 0 else None
+            except OSError:
+                _version = None
+            self.__versions[_memo_key] = _version
+        return self.__versions[_memo_key]
+
+    def file_digest(self, path):
+        ''' SHA-256 of a file, remembered as long as the file size and modification time stay the same '''
+        _stat = os.stat(path)
+        _memo_key = (str(path), _stat.st_size, _stat.st_mtime_ns)
+        _digest = self.__digests.get(_memo_key)
+        if _digest is None:
+            with open(path, 'rb') as infile:
+                _digest = hashlib.sha256(infile.read()).hexdigest()
+            self.__remember_digest(_memo_key, _digest)
+        return _digest
+
+    def __remember_digest(self, memo_key, digest):
+        if len(self.__digests) >= MAX_REMEMBERED_DIGESTS:
+            self.__digests.clear()
+        self.__digests[memo_key] = digest
+
+    def make_key(self, svg_path, export_type, inkscape_path, **options):
+        ''' Build the cache key of a conversion, or None if the Inkscape version is not available '''
+        _version = self.inkscape_version(inkscape_path)
+        if _version is None:
+            return None
+        _options = json.dumps(options, sort_keys=True, default=str)
+        _key = f"{self.file_digest(svg_path)}\n{export_type}\n{_options}\n{_version}"
+        return hashlib.sha256(_key.encode('utf-8')).hexdigest()
+
+    # --------------------------------------------------------------------------
+    # Store
+    # --------------------------------------------------------------------------
+
+    def _entry_path(self, key, export_type):
+        return self.directory / key[:2] / f"{key}.{export_type}"
+
+    def restore(self, key, output_path):
+        ''' Copy (or link) a cached output to `output_path`, return True on a cache hit '''
+        entry = self._entry_path(key, Path(output_path).suffix[1:])
+        try:
+            os.utime(entry)  # mark as recently used
+            self.__materialize(entry, Path(output_path))
+        except FileNotFoundError:
+            with self.__lock:
+                self.stats.misses += 1
+            return False
+        with self.__lock:
+            self.stats.hits += 1
+        return True
+
+    def __materialize(self, entry, output_path):
+        _tmp = output_path.with_name(f".{output_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        if self.hardlink:
+            try:
+                os.link(entry, _tmp)
+            except OSError:
+                shutil.copyfile(entry, _tmp)
+        else:
+            shutil.copyfile(entry, _tmp)
+        os.replace(_tmp, output_path)
+
+    def store(self, key, output_path):
+        ''' Add a conversion output to the cache '''
+        output_path = Path(output_path)
+        entry = self._entry_path(key, output_path.suffix[1:])
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=entry.parent, delete=False) as _tmp:
+            with open(output_path, 'rb') as infile:
+                shutil.copyfileobj(infile, _tmp)
+        os.replace(_tmp.name, entry)
+        _size = entry.stat().st_size
+        with self.__lock:
+            self.stats.stores += 1
+            if self.__size is not None:
+                self.__size += _size
+        self.evict()
+
+    def __entries(self):
+        if not self.directory.is_dir():
+            return []
+        return [p for p in self.directory.glob('??/*') if p.is_file() and not p.name.startswith('tmp')]
+
+    @property
+    def size(self):
+        ''' Total size of cached outputs in bytes '''
+        if self.__size is None:
+            self.__size = sum(p.stat().st_size for p in self.__entries())
+        return self.__size
+
+    def evict(self):
+        ''' Remove least recently used entries until the cache fits in `max_bytes` '''
+        if self.size <= self.max_bytes:
+            return
+        with self.__lock:
+            entries = []
+            for p in self.__entries():
+                try:
+                    _stat = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((_stat.st_mtime_ns, _stat.st_size, p))
+            entries.sort()
+            self.__size = sum(e[1] for e in entries)
+            for _, _size, p in entries:
+                if self.__size <= self.max_bytes:
+                    break
+                try:
+                    p.unlink()
+                except FileNotFoundError:
+                    pass
+                self.__size -= _size
+                self.stats.evictions += 1
+
+    def clear(self):
+        ''' Remove all cached outputs '''
+        for p in self.__entries():
+            p.unlink()
+        self.__size = 0
+
+    # --------------------------------------------------------------------------
+    # SVG files
+    # --------------------------------------------------------------------------
+
+    def write_if_changed(self, path, content):
+        ''' Write SVG content to a file unless the file already has exactly this content
+
+        Unchanged files keep their modification time, so mtime-based checks
+        (e.g. in :func:`pyinkscape.render.svg_to_pdf_many`) still consider their outputs up to date.
+
+        :returns: True if the file was written
+        '''
+        path = Path(path)
+        _digest = hashlib.sha256(content).hexdigest()
+        try:
+            if path.stat().st_size == len(content) and self.file_digest(path) == _digest:
+                with self.__lock:
+                    self.stats.unchanged_writes += 1
+                return False
+        except FileNotFoundError:
+            pass
+        path.write_bytes(content)
+        _stat = path.stat()
+        self.__remember_digest((str(path), _stat.st_size, _stat.st_mtime_ns), _digest)
+        return True
@@ -31,23 +31,79 @@ Latest version can be found at https://github.com/letuananh/pyinkscape
 
 ########################################################################
 
+import math
 import itertools
 
 from .inkscape import Point
+from .inkscape import BBox
 from .inkscape import BLIND_COLORS
-from .inkscape import Style
+from .inkscape import FrozenStyle
+from .geometry import _numpy, _NUMPY_AVAILABLE
+from .pathdata import PathBuilder
 
 # ------------------------------------------------------------------------------
 # Configuration
 # ------------------------------------------------------------------------------
 
-STYLE_SLIDE = Style(fill= "#0066CC", fill_opacity='1', fill_rule='nonzero', stroke_width='0px', stroke='none')
-STYLE_REDDOT = Style(display='inline', opacity='0.98799995', fill='#FF0000', stroke='#e00000', stroke_width='0.52916664', stroke_miterlimit='4', stroke_dasharray='none', stroke_opacity='1')
+STYLE_SLIDE = FrozenStyle(fill= "#0066CC", fill_opacity='1', fill_rule='nonzero', stroke_width='0px', stroke='none')
+STYLE_REDDOT = FrozenStyle(display='inline', opacity='0.98799995', fill='#FF0000', stroke='#e00000', stroke_width='0.52916664', stroke_miterlimit='4', stroke_dasharray='none', stroke_opacity='1')
+STYLE_SERIES = FrozenStyle(fill='none', stroke='#0072B2', stroke_width='1px', stroke_linejoin='round')
+STYLE_BAR = FrozenStyle(fill='#0072B2', fill_opacity='1', stroke='none')
+STYLE_DOT = FrozenStyle(fill='#D55E00', fill_opacity='1', stroke='none')
 
 # ------------------------------------------------------------------------------
 # Piechart
 # ------------------------------------------------------------------------------
 
+# path data of one slice: move to the start point, draw an arc to the end point and close at the center
+_SLICE_PATH = "M {} {} A {} {}, {}, {}, 1, {} {} L {} {} Z"
+# NumPy calls have a fixed overhead that only pays off for pies with many slices
+_NUMPY_MIN_SLICES = 64
+
+
+def pie_slice_paths(center, radius, percents, rotate=0, precision=None):
+    ''' Compute the boundary points and path data of all slices of a pie chart in one pass
+
+    Slices start from 12 o'clock and go clockwise. Every boundary is computed from the cumulative
+    sum of `percents` rather than by rotating the previous boundary, so rounding errors do not build up.
+    Sines and cosines are vectorized with NumPy when it is available and the pie has many slices.
+
+    :param center: Center point of the pie
+    :param radius: (rx, ry) radii of the pie
+    :param percents: A sequence of slice sizes, in percent
+    :param precision: Round path data to this number of decimals with a :class:`PathBuilder`,
+                      or None to write full-precision coordinates
+    :returns: A list of (start, target, path_data) tuples, one per slice
+    '''
+    center = Point.ensure(center)
+    radius = Point.ensure(radius)
+    cx, cy, rx, ry = center.x, center.y, radius.x, radius.y
+    percents = list(percents)
+    totals = list(itertools.accumulate(percents))
+    if _NUMPY_AVAILABLE and len(totals) >= _NUMPY_MIN_SLICES:
+        np = _numpy()
+        _angles = np.radians(np.asarray(totals, dtype=float) * 3.6)
+        xs = (cx + rx * np.sin(_angles)).tolist()
+        ys = (cy - ry * np.cos(_angles)).tolist()
+    else:
+        _angles = [math.radians(t * 3.6) for t in totals]
+        xs = [cx + rx * math.sin(a) for a in _angles]
+        ys = [cy - ry * math.cos(a) for a in _angles]
+    _sx, _sy = cx, cy - ry  # 12 o'clock
+    _slices = []
+    for percent, total, tx, ty in zip(percents, totals, xs, ys):
+        if total >= 100 - 1e-9:
+            tx, ty = cx, cy - ry  # a full circle ends exactly where it starts
+        large = 1 if percent > 50 else 0  # large_arc_flag
+        if precision is None:
+            _path = _SLICE_PATH.format(_sx, _sy, rx, ry, rotate, large, tx, ty, cx, cy)
+        else:
+            _path = str(PathBuilder(precision).move_to(_sx, _sy).arc_to(rx, ry, rotate, large, 1, tx, ty).line_to(cx, cy).close())
+        _slices.append((Point(_sx, _sy), Point(tx, ty), _path))
+        _sx, _sy = tx, ty
+    return _slices
+
+
 class PieSlide:
     def __init__(self, start, percent, pie):
         self.start = Point.ensure(start)
@@ -62,18 +118,19 @@ class PieSlide:
     def path(self, previous=0):
         _target = self.update(previous=previous)
         large = 1 if self.percent > 50 else 0  # large_arc_flag
-        _path = f"M {self.start.x} {self.start.y} A {self.pie.radius.x} {self.pie.radius.y}, {self.pie.rotate}, {large}, 1, {_target.x} {_target.y} L {self.pie.center.x} {self.pie.center.y} Z"
-        return _path
+        return _SLICE_PATH.format(self.start.x, self.start.y, self.pie.radius.x, self.pie.radius.y, self.pie.rotate, large,
+                                  _target.x, _target.y, self.pie.center.x, self.pie.center.y)
 
 
 class PieChart:
-    def __init__(self, group, center, radius, slides=None, colors=BLIND_COLORS, rotate=0):
+    def __init__(self, group, center, radius, slides=None, colors=BLIND_COLORS, rotate=0, precision=None):
         self.group = group
         self.center = Point.ensure(center)
         self.radius = Point.ensure(radius)
         self.slides = list(slides) if slides else []
         self.colors = colors
-        self.rotate = 0
+        self.rotate = rotate
+        self.precision = precision  # decimals of path data, None for full precision
 
     def slide(self, *percents):
         _slides = []
@@ -82,21 +139,17 @@ class PieChart:
                 continue
             _slide = PieSlide((0, 0), percent, self)
             self.slides.append(_slide)
-            _slides.append(_slides)
+            _slides.append(_slide)
         return _slides
 
     def paths(self):
-        _sx, _sy = self.center.x, self.center.y - self.radius.y
         _paths = []
-        # _accu = 0
-        for slide in self.slides:
-            slide.start.x = _sx
-            slide.start.y = _sy
-            _path = slide.path()  # (previous=_accu)
-            _paths.append(_path)
-            _sx = slide.target.x  # move point to the next
-            _sy = slide.target.y
-            # _accu += slide.percent  # accumulation
+        _slices = pie_slice_paths(self.center, self.radius, (s.percent for s in self.slides),
+                                  rotate=self.rotate, precision=self.precision)
+        for slide, (start, target, path) in zip(self.slides, _slices):
+            slide.start = start
+            slide.target = target
+            _paths.append(path)
         return _paths
 
     def render_slide(self, path, color, **kwargs):
@@ -121,3 +174,251 @@ def show_locs(pie, group, radius=3):
     # draw the center point
     group.circle(pie.center, radius, style=STYLE_REDDOT)
 
+
+# ------------------------------------------------------------------------------
+# Decimation
+# ------------------------------------------------------------------------------
+
+def _tolist(values):
+    if hasattr(values, 'tolist'):
+        return values.tolist()
+    return list(values)
+
+
+def decimate_minmax(xs, ys, columns):
+    ''' Keep at most 4 samples (first, min, max and last) of each of `columns` equal-width x buckets
+
+    The visual envelope of the series is preserved, i.e. every spike is still drawn.
+    `xs` must be sorted in ascending order.
+
+    :returns: A tuple of (xs, ys) lists
+    '''
+    xs, ys = _tolist(xs), _tolist(ys)
+    if len(xs) <= 4 * columns:
+        return xs, ys
+    x0 = xs[0]
+    span = (xs[-1] - x0) or 1
+    _keep = []
+    bucket = None
+    first = last = imin = imax = 0
+    for idx, (x, y) in enumerate(zip(xs, ys)):
+        _bucket = min(int((x - x0) / span * columns), columns - 1)
+        if _bucket != bucket:
+            if bucket is not None:
+                _keep.extend(sorted({first, imin, imax, last}))
+            bucket = _bucket
+            first = last = imin = imax = idx
+        else:
+            last = idx
+            if y < ys[imin]:
+                imin = idx
+            elif y > ys[imax]:
+                imax = idx
+    _keep.extend(sorted({first, imin, imax, last}))
+    return [xs[i] for i in _keep], [ys[i] for i in _keep]
+
+
+def decimate_lttb(xs, ys, threshold):
+    ''' Downsample a series to `threshold` samples with the Largest-Triangle-Three-Buckets algorithm
+
+    :returns: A tuple of (xs, ys) lists
+    '''
+    xs, ys = _tolist(xs), _tolist(ys)
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return xs, ys
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    _keep = [0]
+    for i in range(threshold - 2):
+        # average point of the next bucket
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_count = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / avg_count
+        avg_y = sum(ys[avg_start:avg_end]) / avg_count
+        # pick the point of the current bucket that forms the largest triangle
+        ax, ay = xs[a], ys[a]
+        max_area = -1
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                a = j
+        _keep.append(a)
+    _keep.append(n - 1)
+    return [xs[i] for i in _keep], [ys[i] for i in _keep]
+
+
+def decimate_grid(xs, ys, cell=1.0):
+    ''' Keep only the first point of each `cell` x `cell` square (coordinates are canvas units)
+
+    :returns: A tuple of (xs, ys) lists
+    '''
+    _seen = set()
+    _xs, _ys = [], []
+    for x, y in zip(_tolist(xs), _tolist(ys)):
+        _cell = (int(x // cell), int(y // cell))
+        if _cell not in _seen:
+            _seen.add(_cell)
+            _xs.append(x)
+            _ys.append(y)
+    return _xs, _ys
+
+
+def decimate_max(values, columns):
+    ''' Merge adjacent values into `columns` buckets, keeping the value with the largest magnitude of each bucket '''
+    values = _tolist(values)
+    n = len(values)
+    if n <= columns:
+        return values
+    return [max(values[n * c // columns:n * (c + 1) // columns], key=abs) for c in range(columns)]
+
+
+DECIMATORS = {'minmax': decimate_minmax, 'lttb': decimate_lttb}
+
+# ------------------------------------------------------------------------------
+# XY charts
+# ------------------------------------------------------------------------------
+
+class XYChart:
+
+    ''' Base class of charts that map data values into a rectangular area of a group
+
+    :param group: The group to draw into
+    :param bbox: Drawing area, either a BBox or a tuple (x, y, width, height) in canvas units
+    :param x_range: (min, max) of the x axis, default to the data range
+    :param y_range: (min, max) of the y axis, default to the data range
+    :param resolution: Number of output samples per canvas unit, used to bound decimated output
+    '''
+
+    def __init__(self, group, bbox, x_range=None, y_range=None, style=None, resolution=1.0):
+        self.group = group
+        self.bbox = bbox if isinstance(bbox, BBox) else BBox(*bbox)
+        self.x_range = x_range
+        self.y_range = y_range
+        self.style = style
+        self.resolution = resolution
+
+    @property
+    def columns(self):
+        ''' Number of output columns (i.e. "pixels") available along the x axis '''
+        return max(1, int(math.ceil(self.bbox.width * self.resolution)))
+
+    @staticmethod
+    def _range(values, fixed=None):
+        if fixed is not None:
+            return fixed
+        if not values:
+            return (0, 1)
+        return (min(values), max(values))
+
+    def scale_x(self, xs, x_range):
+        _min, _max = x_range
+        _factor = self.bbox.width / ((_max - _min) or 1)
+        _x1 = self.bbox.x1
+        return [_x1 + (x - _min) * _factor for x in xs]
+
+    def scale_y(self, ys, y_range):
+        ''' Map y values into canvas coordinates (SVG y axis goes downward) '''
+        _min, _max = y_range
+        _factor = self.bbox.height / ((_max - _min) or 1)
+        _y2 = self.bbox.y2
+        return [_y2 - (y - _min) * _factor for y in ys]
+
+
+class LineChart(XYChart):
+
+    ''' A line series drawn as a single <path> element
+
+    >>> chart = LineChart(layer, (10, 10, 400, 200), timestamps, values, decimate='minmax')
+    >>> chart.render()
+
+    :param decimate: None, "minmax", "lttb" or a function `f(xs, ys, size) -> (xs, ys)`.
+                     The output is bounded by the chart width instead of the number of samples.
+    :param precision: Number of decimals of path coordinates
+    '''
+
+    def __init__(self, group, bbox, xs, ys=None, decimate=None, style=STYLE_SERIES, precision=2, **kwargs):
+        super().__init__(group, bbox, style=style, **kwargs)
+        self.precision = precision
+        if ys is None:
+            xs, ys = range(len(xs)), xs
+        self.xs = _tolist(xs)
+        self.ys = _tolist(ys)
+        self.decimate = DECIMATORS.get(decimate, decimate)
+
+    def points(self):
+        ''' Get the (decimated) series in canvas coordinates '''
+        x_range = self._range(self.xs, self.x_range)
+        y_range = self._range(self.ys, self.y_range)
+        xs, ys = self.xs, self.ys
+        if self.decimate is not None:
+            xs, ys = self.decimate(xs, ys, self.columns)
+        return self.scale_x(xs, x_range), self.scale_y(ys, y_range)
+
+    def path_data(self):
+        return str(PathBuilder(self.precision).lines(*self.points()))
+
+    def render(self, id_prefix="linechart"):
+        return self.group.path(self.path_data(), style=self.style, id_prefix=id_prefix)
+
+
+class ScatterChart(XYChart):
+
+    ''' A scatter plot drawn as circles
+
+    :param decimate: When True, draw at most one point per (1 / resolution) square of the canvas
+    '''
+
+    def __init__(self, group, bbox, xs, ys, radius=1, decimate=False, style=STYLE_DOT, **kwargs):
+        super().__init__(group, bbox, style=style, **kwargs)
+        self.xs = _tolist(xs)
+        self.ys = _tolist(ys)
+        self.radius = radius
+        self.decimate = decimate
+
+    def points(self):
+        ''' Get the (decimated) points in canvas coordinates '''
+        xs = self.scale_x(self.xs, self._range(self.xs, self.x_range))
+        ys = self.scale_y(self.ys, self._range(self.ys, self.y_range))
+        if self.decimate:
+            xs, ys = decimate_grid(xs, ys, cell=1 / self.resolution)
+        return xs, ys
+
+    def render(self, id_prefix="scatterchart"):
+        xs, ys = self.points()
+        return self.group.circles(list(zip(xs, ys)), self.radius, style=self.style, id_prefix=id_prefix)
+
+
+class BarChart(XYChart):
+
+    ''' A bar chart with one bar per value, drawn from the zero baseline
+
+    :param gap: Fraction of each slot left empty between bars
+    :param decimate: When True and there are more bars than columns, adjacent bars are merged (largest magnitude wins)
+    '''
+
+    def __init__(self, group, bbox, values, gap=0.2, decimate=False, style=STYLE_BAR, **kwargs):
+        super().__init__(group, bbox, style=style, **kwargs)
+        self.values = _tolist(values)
+        self.gap = gap
+        self.decimate = decimate
+
+    def rects(self):
+        ''' Get (x, y, width, height) of every bar in canvas coordinates '''
+        values = decimate_max(self.values, self.columns) if self.decimate else self.values
+        if not values:
+            return []
+        y_range = self.y_range or (min(0, min(values)), max(0, max(values)))
+        _slot = self.bbox.width / len(values)
+        _width = _slot * (1 - self.gap)
+        _base = self.scale_y([0], y_range)[0]
+        _tops = self.scale_y(values, y_range)
+        _x1 = self.bbox.x1 + (_slot - _width) / 2
+        return [(_x1 + idx * _slot, min(top, _base), _width, abs(_base - top)) for idx, top in enumerate(_tops)]
+
+    def render(self, id_prefix="barchart"):
+        _rects = self.rects()
+        return self.group.rects([(x, y) for x, y, _, _ in _rects], [(w, h) for _, _, w, h in _rects],
+                                style=self.style, id_prefix=id_prefix)
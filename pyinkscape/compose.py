@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+Stream generated layers into an SVG file one at a time
+
+Latest version can be found at https://github.com/letuananh/pyinkscape
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+@license: MIT
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+########################################################################
+
+import logging
+
+from .inkscape import Canvas, Group, etree, _LXML_AVAILABLE
+from .inkscape import SVG_GROUP_TAG, INKSCAPE_LABEL, INKSCAPE_GROUPMODE
+
+
+def getLogger():
+    return logging.getLogger(__name__)
+
+
+class LayerWriter:
+
+    ''' Write a document layer by layer, keeping only the current layer in memory
+
+    The template canvas is written up to the place where new layers go, then each finished
+    layer is serialized, removed from the canvas and freed, and finally the rest of the
+    template is written. Peak memory is bounded by the largest layer instead of the whole document.
+
+    >>> with LayerWriter("output.svg", Canvas("template.svg")) as writer:
+    ...     for job in jobs:
+    ...         layer = writer.new_layer(job.name)
+    ...         job.draw(layer)
+    ...         writer.write(layer)
+    '''
+
+    def __init__(self, target, canvas=None, parent=None, encoding="utf-8", pretty_print=True):
+        '''
+        :param target: A file path or a binary file-like object
+        :param canvas: The template canvas, default to a blank canvas
+        :param parent: A :class:`Group` of the canvas to stream layers into, default to the root svg element
+        :param encoding: Output encoding
+        :param pretty_print: Indent the template part of the output (only supported by lxml)
+        '''
+        self.canvas = canvas if canvas is not None else Canvas()
+        self.parent = parent
+        self.encoding = encoding
+        self.pretty_print = pretty_print
+        self.written = 0  # number of layers written
+        self.__target = target
+        self.__file = None
+        self.__owns_file = False
+        self.__tail = None
+
+    @property
+    def closed(self):
+        return self.__file is None
+
+    def open(self):
+        ''' Write the template up to the insertion point '''
+        if self.__file is not None:
+            return self
+        head, self.__tail = self.canvas._split_output(self.parent.elem if self.parent is not None else None,
+                                                      encoding=self.encoding, pretty_print=self.pretty_print)
+        if hasattr(self.__target, 'write'):
+            self.__file = self.__target
+        else:
+            self.__file = open(self.__target, 'wb')
+            self.__owns_file = True
+        self.__file.write(head)
+        return self
+
+    def new_layer(self, label, id=None):
+        ''' Create an empty layer at the insertion point, draw on it and then pass it to :meth:`write` '''
+        # the template part must be written before it contains pending layers
+        self.open()
+        if self.parent is None:
+            return self.canvas.new_layer(label, id=id)
+        elem = self.parent.new(SVG_GROUP_TAG, id=id, id_prefix='layer', **{INKSCAPE_LABEL: label, INKSCAPE_GROUPMODE: 'layer'})
+        return Group(elem, self.parent.elem, canvas=self.canvas)
+
+    def write(self, group):
+        ''' Serialize a finished layer or group and free it
+
+        The group is removed from the template canvas if it belongs to it.
+
+        :param group: A :class:`Group` (e.g. from :meth:`new_layer` or another canvas) or an element
+        '''
+        if self.__file is None:
+            self.open()
+        elem = group.elem if isinstance(group, Group) else group
+        if _LXML_AVAILABLE:
+            self.__file.write(etree.tostring(elem, encoding=self.encoding, xml_declaration=False, with_tail=False))
+        else:
+            _tail, elem.tail = elem.tail, None
+            self.__file.write(etree.tostring(elem, encoding=self.encoding, xml_declaration=False))
+            elem.tail = _tail
+        if isinstance(group, Group) and group.canvas is self.canvas:
+            group.delete()
+        elem.clear()
+        self.written += 1
+
+    def close(self):
+        ''' Write the rest of the template and close the output file (if it was opened by this writer) '''
+        if self.__file is None:
+            return
+        try:
+            self.__file.write(self.__tail)
+        finally:
+            if self.__owns_file:
+                self.__file.close()
+            self.__file = None
+            self.__tail = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+Geometry helpers for large point sets
+
+Latest version can be found at https://github.com/letuananh/pyinkscape
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+@license: MIT
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+########################################################################
+
+
+import importlib.util
+import math
+import sys
+
+from .inkscape import Point
+from .inkscape import BBox
+
+# NumPy is optional (PointArray falls back to plain Python lists) and is only imported on first use
+_NUMPY_AVAILABLE = importlib.util.find_spec('numpy') is not None
+np = None
+
+
+def _numpy():
+    ''' Import NumPy on demand '''
+    global np
+    if np is None:
+        import numpy as np
+    return np
+
+
+# ------------------------------------------------------------------------------
+# Point sets
+# ------------------------------------------------------------------------------
+
+class PointArray:
+
+    ''' A compact set of 2D points stored as two coordinate arrays
+
+    Coordinates are kept in NumPy arrays when NumPy is available (or in Python lists otherwise),
+    so transforming a large point set is one array operation instead of one Point object per point.
+    All transformations return new PointArray objects.
+
+    >>> pts = PointArray.from_points([(0, 0), (10, 0), (10, 10)])
+    >>> pts.rotate(90, center=(5, 5)).translate(1, 1).bbox().to_tuple()
+    (1.0, 1.0, 10.0, 10.0)
+    '''
+
+    __slots__ = ('xs', 'ys', 'use_numpy')
+
+    def __init__(self, xs, ys, use_numpy=None):
+        '''
+        :param xs: X coordinates
+        :param ys: Y coordinates
+        :param use_numpy: Store coordinates as NumPy arrays, default to True when NumPy is available
+        '''
+        self.use_numpy = _NUMPY_AVAILABLE if use_numpy is None else use_numpy
+        if self.use_numpy:
+            _np = _numpy()
+            self.xs = _np.asarray(xs, dtype=float)
+            self.ys = _np.asarray(ys, dtype=float)
+        else:
+            self.xs = [float(x) for x in xs]
+            self.ys = [float(y) for y in ys]
+        if len(self.xs) != len(self.ys):
+            raise ValueError(f"Coordinate arrays have different lengths ({len(self.xs)} != {len(self.ys)})")
+
+    @staticmethod
+    def from_points(points, use_numpy=None):
+        ''' Create a point array from Point objects, (x, y) pairs or an (n, 2) NumPy array '''
+        if isinstance(points, PointArray):
+            return PointArray(points.xs, points.ys, use_numpy=use_numpy)
+        _np = sys.modules.get('numpy')  # points cannot be an ndarray if NumPy was never imported
+        if _np is not None and isinstance(points, _np.ndarray) and points.ndim == 2:
+            return PointArray(points[:, 0], points[:, 1], use_numpy=use_numpy)
+        xs, ys = [], []
+        for p in points:
+            if isinstance(p, Point):
+                xs.append(p.x)
+                ys.append(p.y)
+            else:
+                xs.append(p[0])
+                ys.append(p[1])
+        return PointArray(xs, ys, use_numpy=use_numpy)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __getitem__(self, idx):
+        return Point(float(self.xs[idx]), float(self.ys[idx]))
+
+    def __iter__(self):
+        for x, y in zip(self.tolist_x(), self.tolist_y()):
+            yield Point(x, y)
+
+    def __repr__(self):
+        return f"PointArray({len(self)} points)"
+
+    def tolist_x(self):
+        return self.xs.tolist() if self.use_numpy else list(self.xs)
+
+    def tolist_y(self):
+        return self.ys.tolist() if self.use_numpy else list(self.ys)
+
+    def tolist(self):
+        ''' Get all points as a list of (x, y) tuples '''
+        return list(zip(self.tolist_x(), self.tolist_y()))
+
+    def __new(self, xs, ys):
+        return PointArray(xs, ys, use_numpy=self.use_numpy)
+
+    def translate(self, dx, dy=None):
+        ''' Move all points by (dx, dy) '''
+        dy = dx if dy is None else dy
+        if self.use_numpy:
+            return self.__new(self.xs + dx, self.ys + dy)
+        return self.__new([x + dx for x in self.xs], [y + dy for y in self.ys])
+
+    def scale(self, sx, sy=None, center=(0, 0)):
+        ''' Scale all points by (sx, sy) relative to a center point '''
+        sy = sx if sy is None else sy
+        cx, cy = _xy(center)
+        if self.use_numpy:
+            return self.__new((self.xs - cx) * sx + cx, (self.ys - cy) * sy + cy)
+        return self.__new([(x - cx) * sx + cx for x in self.xs], [(y - cy) * sy + cy for y in self.ys])
+
+    def rotate(self, theta, center=(0, 0)):
+        ''' Rotate all points around a center point by `theta` degrees (same direction as :meth:`Point.rotate`) '''
+        cx, cy = _xy(center)
+        t_rad = math.radians(theta)
+        _cos, _sin = math.cos(t_rad), math.sin(t_rad)
+        if self.use_numpy:
+            n_x = self.xs - cx
+            n_y = self.ys - cy
+            return self.__new(n_x * _cos - n_y * _sin + cx, n_x * _sin + n_y * _cos + cy)
+        xs, ys = [], []
+        for x, y in zip(self.xs, self.ys):
+            n_x, n_y = x - cx, y - cy
+            xs.append(n_x * _cos - n_y * _sin + cx)
+            ys.append(n_x * _sin + n_y * _cos + cy)
+        return self.__new(xs, ys)
+
+    def bbox(self):
+        ''' Get the bounding box of all points, or None if the array is empty '''
+        if not len(self):
+            return None
+        if self.use_numpy:
+            x1, x2 = float(self.xs.min()), float(self.xs.max())
+            y1, y2 = float(self.ys.min()), float(self.ys.max())
+        else:
+            x1, x2 = min(self.xs), max(self.xs)
+            y1, y2 = min(self.ys), max(self.ys)
+        return BBox(x1, y1, x2 - x1, y2 - y1)
+
+
+def _xy(p):
+    return (p.x, p.y) if isinstance(p, Point) else (p[0], p[1])
@@ -31,12 +31,25 @@ Latest version can be found at https://github.com/letuananh/pyinkscape
 
 ########################################################################
 
+import io
 import os
+import copy
+import functools
+import itertools
 import logging
 import math
+import re
+import threading
 import warnings
+import weakref
+from collections import OrderedDict
 from pathlib import Path
+from types import MappingProxyType
+from time import perf_counter
 try:
+    # set PYINKSCAPE_XML_BACKEND=etree to use xml.etree.ElementTree even when lxml is installed
+    if os.environ.get('PYINKSCAPE_XML_BACKEND', '').lower() in ('etree', 'elementtree'):
+        raise ImportError("lxml is disabled by PYINKSCAPE_XML_BACKEND")
     from lxml import etree
     from lxml.etree import XMLParser
     _LXML_AVAILABLE = True
@@ -45,43 +58,13 @@ except Exception as e:
     from xml.etree import ElementTree as etree
     from xml.etree.ElementTree import XMLParser
     _LXML_AVAILABLE = False
-try:
-    from chirptext.anhxa import IDGenerator
-    from chirptext.cli import setup_logging
-    _CHIRPTEXT_AVAILABLE = True
-except Exception as e:
-    _CHIRPTEXT_AVAILABLE = False
-    # When chirptext is not available, fall back to built-in IDGenerator
-    # IDGenerator class is adopted from:
-    # https://github.com/letuananh/chirptext/blob/master/chirptext/anhxa.py
-    import threading
-    class IDGenerator(object):
-
-        def __init__(self, id_seed=1, id_hook=None):
-            ''' id_seed = starting number '''
-            self.__id_seed = id_seed
-            self.__id_check_hook = id_hook  # external ID checker
-            self.__lock = threading.Lock()
-
-        def __next__(self):
-            with self.__lock:
-                while True:
-                    valid_id = self.__id_seed
-                    self.__id_seed += 1
-                    if self.__id_check_hook is None or not self.__id_check_hook(valid_id):
-                        break
-                return valid_id
 
+from . import instrument
 
+_SPLIT_MARKER = '__pyinkscape_split__'
 _MY_DIR = Path(os.path.dirname(os.path.realpath(__file__)))
 _BLANK_CANVAS = _MY_DIR / 'data' / 'blank.svg'
 
-# ------------------------------------------------------------------------------
-# use chirptext setup_logging if possible
-try:
-    setup_logging('logging.json', 'logs')
-except Exception:
-    pass
 # -------------------------------------------------------------------------------
 # Configuration
 # ------------------------------------------------------------------------------
@@ -102,16 +85,98 @@ class Style:
         return self.attributes
 
     def __str__(self):
-        return ";".join("{}:{}".format(k.replace('_', '-'), v) for k, v in self.attributes.items())
+        return _css(self.attributes.items())
 
     def clone(self, **kwargs):
         s = Style(**self.attributes)
         s.attributes.update(kwargs)
         return s
 
+    def freeze(self):
+        ''' Get an immutable copy of this style (see :class:`FrozenStyle`) '''
+        return FrozenStyle(**self.attributes)
+
+
+def _css(attributes):
+    return ";".join("{}:{}".format(k.replace('_', '-'), v) for k, v in attributes)
+
+
+class FrozenStyle(Style):
+
+    ''' An immutable style that builds its CSS string only once
+
+    Equal frozen styles are interned, i.e. they share one object and one string.
+    Cloning a frozen style with new properties reuses the cached string as a prefix.
+
+    >>> s = FrozenStyle(fill='#FF0000', stroke='none')
+    >>> s is Style(fill='#FF0000', stroke='none').freeze()
+    True
+    '''
+
+    __interned = weakref.WeakValueDictionary()
+    __lock = threading.Lock()
+
+    def __new__(cls, **kwargs):
+        return cls._from_items(tuple(kwargs.items()))
+
+    def __init__(self, **kwargs):
+        pass  # everything is set up in __new__()
+
+    @classmethod
+    def _from_items(cls, items, css=None):
+        # equal values of different types (1, 1.0, True) are written differently
+        key = (items, tuple(type(v) for _, v in items))
+        try:
+            with cls.__lock:
+                obj = cls.__interned.get(key)
+            hashable = True
+        except TypeError:
+            # unhashable values cannot be interned
+            hashable = False
+            obj = None
+        if obj is None:
+            obj = super().__new__(cls)
+            obj.__items = items
+            obj.__attributes = MappingProxyType(dict(items))
+            obj.__css = css if css is not None else _css(obj.__attributes.items())
+            if hashable:
+                with cls.__lock:
+                    obj = cls.__interned.setdefault(key, obj)
+        return obj
+
+    @property
+    def attributes(self):
+        return self.__attributes
+
+    def __str__(self):
+        return self.__css
+
+    def __reduce__(self):
+        return (FrozenStyle._from_items, (tuple(self.__attributes.items()),))
+
+    def clone(self, **kwargs):
+        ''' Get a frozen style with updated properties '''
+        if not kwargs:
+            return self
+        if any(k in self.__attributes for k in kwargs):
+            return FrozenStyle(**{**self.__attributes, **kwargs})
+        _extra = _css(kwargs.items())
+        return FrozenStyle._from_items(self.__items + tuple(kwargs.items()),
+                                       css=f"{self.__css};{_extra}" if self.__css else _extra)
+
+    def freeze(self):
+        return self
+
+    def thaw(self):
+        ''' Get a mutable copy of this style '''
+        return Style(**self.__attributes)
+
 
 INKSCAPE_NS = 'http://www.inkscape.org/namespaces/inkscape'
 SVG_NS = 'http://www.w3.org/2000/svg'
+INKSCAPE_LABEL = f'{{{INKSCAPE_NS}}}label'
+INKSCAPE_GROUPMODE = f'{{{INKSCAPE_NS}}}groupmode'
+SVG_GROUP_TAG = f'{{{SVG_NS}}}g'
 SVG_NAMESPACES = {'ns': SVG_NS,
           'svg': SVG_NS,
           'dc': "http://purl.org/dc/elements/1.1/",
@@ -120,10 +185,79 @@ SVG_NAMESPACES = {'ns': SVG_NS,
 
           "sodipodi": "http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd",
           'inkscape': INKSCAPE_NS}
-DEFAULT_LINESTYLE = Style(display='inline', fill='none', stroke_width='0.86458332px', stroke_linecap='butt', stroke_linejoin='miter', stroke_opacity='1', stroke='#FF0000')
-STYLE_FPNAME = Style(font_size='20px', font_family='sans-serif', font_style='normal', font_weight='normal', line_height='1.25', letter_spacing='0px', word_spacing='0px', fill='#000000', fill_opacity='1', stroke='none')
+# the default styles are immutable, use clone() or thaw() to derive new styles
+DEFAULT_LINESTYLE = FrozenStyle(display='inline', fill='none', stroke_width='0.86458332px', stroke_linecap='butt', stroke_linejoin='miter', stroke_opacity='1', stroke='#FF0000')
+STYLE_FPNAME = FrozenStyle(font_size='20px', font_family='sans-serif', font_style='normal', font_weight='normal', line_height='1.25', letter_spacing='0px', word_spacing='0px', fill='#000000', fill_opacity='1', stroke='none')
 BLIND_COLORS = ("#999999", "#E69F00", "#56B4E9", "#009E73", "#F0E442", "#0072B2", "#D55E00", "#CC79A7")
-__idgen = IDGenerator()
+
+
+class IDAllocator:
+
+    ''' A process-wide ID generator that hands out blocks of numbers to each thread
+
+    Each thread takes a block of `block_size` numbers from a shared counter
+    and then allocates IDs from its own block, so there is no lock per ID.
+    IDs are unique within the process, but their order across threads is not deterministic.
+    '''
+
+    def __init__(self, id_seed=1, block_size=1024):
+        self.id_seed = id_seed
+        self.block_size = block_size
+        self.__blocks = itertools.count()  # next() on itertools.count is atomic in CPython
+        self.__local = threading.local()
+
+    def __range(self):
+        _local = self.__local
+        if getattr(_local, 'next', None) is None or _local.next >= _local.end:
+            _local.next = self.id_seed + next(self.__blocks) * self.block_size
+            _local.end = _local.next + self.block_size
+        return _local
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        _local = self.__range()
+        _id = _local.next
+        _local.next += 1
+        return _id
+
+    def take(self, count):
+        ''' Allocate `count` IDs at once '''
+        ids = []
+        while count > 0:
+            _local = self.__range()
+            _end = min(_local.end, _local.next + count)
+            ids.extend(range(_local.next, _end))
+            count -= _end - _local.next
+            _local.next = _end
+        return ids
+
+
+class SequentialIDAllocator:
+
+    ''' A deterministic ID generator (id_seed, id_seed + 1, ...)
+
+    Give each Canvas its own sequential allocator to get reproducible, diffable outputs:
+
+    >>> c = Canvas(id_allocator=SequentialIDAllocator())
+    '''
+
+    def __init__(self, id_seed=1):
+        self.__counter = itertools.count(id_seed)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.__counter)
+
+    def take(self, count):
+        ''' Allocate `count` IDs at once '''
+        return list(itertools.islice(self.__counter, count))
+
+
+__idgen = IDAllocator()
 
 
 def new_id(prefix=None):
@@ -132,7 +266,37 @@ def new_id(prefix=None):
     return '{prefix}_{id}'.format(prefix=prefix, id=next(__idgen))
 
 
+def new_ids(count, prefix=None):
+    ''' Generate a list of `count` new IDs '''
+    if not prefix:
+        prefix = '_pyinkscape_'
+    _template = prefix + '_{}'
+    return [_template.format(x) for x in __idgen.take(count)]
+
+
+def _as_rows(values):
+    ''' Convert a sequence of points (Point objects, tuples or a NumPy array) into a list of tuples '''
+    if hasattr(values, 'tolist'):
+        values = values.tolist()
+    return [(p.x, p.y) if isinstance(p, Point) else p for p in values]
+
+
+def _broadcast(value, count):
+    ''' Repeat a scalar (or a single pair) `count` times, or check the length of a sequence '''
+    if hasattr(value, 'tolist'):
+        value = value.tolist()
+    if isinstance(value, (int, float, str)):
+        return [value] * count
+    value = list(value)
+    if len(value) != count:
+        raise ValueError(f"Expected {count} values but got {len(value)}")
+    return value
+
+
 class Point:
+
+    __slots__ = ('x', 'y')
+
     def __init__(self, x: float, y: float):
         self.x = x
         self.y = y
@@ -180,11 +344,11 @@ class Point:
         else:
             return Point(self.x / other, self.y / other)
 
+    __truediv__ = __div__
+
     @staticmethod
     def rotate_percent(point, center, percent):
-        degrees = percent * 3.6
-        getLogger().debug(f"Percent: {percent} - Degrees: {degrees}")
-        return Point.rotate(point, center, degrees)
+        return Point.rotate(point, center, percent * 3.6)
 
     @staticmethod
     def ensure(p):
@@ -206,18 +370,21 @@ class Point:
         t_rad = math.radians(theta)
         n_x = point.x - center.x  # shift center point to (0, 0)
         n_y = point.y - center.y
-        getLogger().debug(f"shifted = ({n_x}, {n_y}) - theta (in radians) = {t_rad}")
-        r_x = n_x * math.cos(t_rad) - n_y * math.sin(t_rad)  # rotation matrix
-        r_y = n_x * math.sin(t_rad) + n_y * math.cos(t_rad)
-        getLogger().debug(f"new point = ({r_x + center.x}, {r_y + center.y})")
+        _cos, _sin = math.cos(t_rad), math.sin(t_rad)
+        r_x = n_x * _cos - n_y * _sin  # rotation matrix
+        r_y = n_x * _sin + n_y * _cos
         return Point(r_x + center.x, r_y + center.y)  # shift it back
 
 
 class Dimension:
+
+    __slots__ = ('width', 'height')
+
     def __init__(self, width, height):
         self.width = width
         self.height = height
 
+    @staticmethod
     def ensure(p):
         if isinstance(p, Dimension):
             return p
@@ -227,38 +394,22 @@ class Dimension:
 
 class BBox():
     ''' A bounding box represents by a top-left anchor (x1, y1) and a dimension (width, height) '''
-    
-    def __init__(self, x, y, width, height):
-        self.__anchor = Point(x, y)
-        self.__dimension = Dimension(width, height)
 
-    @property
-    def x1(self):
-        ''' x value of the top-left anchor '''
-        return self.__anchor.x
-
-    @property
-    def y1(self):
-        ''' y value of the top-left anchor '''
-        return self.__anchor.y
-
-    @property
-    def width(self):
-        ''' Width of the bounding box '''
-        return self.__dimension.width
+    __slots__ = ('x1', 'y1', 'width', 'height')
 
-    @property
-    def height(self):
-        ''' Height of the bounding box '''
-        return self.__dimension.height
+    def __init__(self, x, y, width, height):
+        self.x1 = x  # x value of the top-left anchor
+        self.y1 = y  # y value of the top-left anchor
+        self.width = width
+        self.height = height
 
     @property
     def x2(self):
-        return self.__anchor.x + self.__dimension.width
+        return self.x1 + self.width
 
     @property
     def y2(self):
-        return self.__anchor.y + self.__dimension.height
+        return self.y1 + self.height
 
     def to_tuple(self) -> tuple:
         return (self.x1, self.y1, self.width, self.height)
@@ -271,31 +422,40 @@ class Group:
 
     ''' Represents either a group (composite object) or a layer (special group) '''
     
-    def __init__(self, elem, parent_elem):
+    def __init__(self, elem, parent_elem, canvas=None):
         self.elem = elem
         self.parent_elem = parent_elem
+        self.canvas = canvas
         self.ID = elem.get('id')
         self.tag = elem.tag
-        self.label = elem.get('{http://www.inkscape.org/namespaces/inkscape}label')
+        self.label = elem.get(INKSCAPE_LABEL)
 
     def delete(self):
         ''' Remove this group/layer from a canvas '''
-        self.parent_elem.remove(self.elem)
-        # self.elem.getparent().remove(self.elem)
+        if self.canvas is not None:
+            self.parent_elem = self.canvas._parent_of(self.elem)
+            self.parent_elem.remove(self.elem)
+            self.canvas._unindex(self.elem)
+        else:
+            self.parent_elem.remove(self.elem)
 
     def paths(self):
-        paths = self.elem.xpath('//ns:path', namespaces=SVG_NAMESPACES)
-        return [Path(p) for p in paths]
+        ''' Get all paths inside this group '''
+        return [Path(p) for p in _iter_tag(self.elem, 'path')]
 
     def new(self, tag_name, id=None, style=None, id_prefix=None, **kwargs):
+        if instrument.enabled:
+            instrument.emit(f"element.{tag_name.rpartition('}')[2]}")
         e = etree.SubElement(self.elem, tag_name)
         if not id:
-            id = new_id(prefix=id_prefix)
+            id = self.canvas.new_id(prefix=id_prefix) if self.canvas is not None else new_id(prefix=id_prefix)
         e.set('id', id)
         if style:
             e.set('style', str(style))
         for k, v in kwargs.items():
             e.set(str(k), str(v))
+        if self.canvas is not None:
+            self.canvas._index_element(e, self.elem)
         return e
 
     def line(self, from_point, to_point, style: Style=DEFAULT_LINESTYLE, id_prefix='__pyinkscape_line', **kwargs):
@@ -318,35 +478,103 @@ class Group:
         return self.new("rect", x=topleft.x, y=topleft.y, width=size.width, height=size.height, style=style, id_prefix=id_prefix, **kwargs)
 
     def path(self, path_code, id=None, style=DEFAULT_LINESTYLE, id_prefix='__pyinkscape_path', **kwargs):
-        p = self.new("path", style=style, id_prefix=id_prefix, **kwargs)
-        p.set('d', path_code)
-        p.set('{http://www.inkscape.org/namespaces/inkscape}connector-curvature', "0")
+        kwargs['d'] = path_code
+        kwargs['{http://www.inkscape.org/namespaces/inkscape}connector-curvature'] = "0"
+        p = self.new("path", id=id, style=style, id_prefix=id_prefix, **kwargs)
         return Path(p)
 
     def circle(self, center, r, style=DEFAULT_LINESTYLE, id_prefix='__pyinkscape_circle', **kwargs):
         center = Point.ensure(center)
-        c = self.new("circle", style=style, id_prefix=id_prefix, **kwargs)
-        c.set('cx', str(center.x))
-        c.set('cy', str(center.y))
-        c.set('r', str(r))
+        c = self.new("circle", style=style, id_prefix=id_prefix, cx=center.x, cy=center.y, r=r, **kwargs)
         return Circle(c)
 
-    def text(self, text, center, width='', height='', font_size='18px', font_family="sans-serif", fill="black", text_anchor='middle', style=STYLE_FPNAME, id_prefix='__pyinkscape_text', **kwargs):
-        txt = self.new('text', id_prefix=id_prefix)
+    def text(self, text, center, width='', height='', font_size='18px', font_family="sans-serif", fill="black", text_anchor='middle', style=STYLE_FPNAME, id=None, id_prefix='__pyinkscape_text', **kwargs):
         center = Point.ensure(center)
-        txt.set('x', str(center.x))
-        txt.set('y', str(center.y))
-        txt.set('font-size', font_size)
-        txt.set('font-family', font_family)
-        txt.set('fill', fill)
-        txt.set('text-anchor', text_anchor)
-        if style:
-            txt.set('style', str(style))        
-        for k, v in kwargs.items():
-            txt.set(k, str(v))
+        txt = self.new('text', id=id, style=style, id_prefix=id_prefix,
+                       x=center.x, y=center.y,
+                       **{'font-size': font_size, 'font-family': font_family, 'fill': fill, 'text-anchor': text_anchor},
+                       **kwargs)
         txt.text = text
         return Text(txt)
 
+    def _new_many(self, tag_name, attribute_rows, style=None, id_prefix=None, **kwargs):
+        ''' Create many elements with the same tag and style in one pass
+
+        The style string and extra attributes are formatted once and IDs are allocated as one block.
+        '''
+        if instrument.enabled:
+            instrument.emit(f"element.{tag_name.rpartition('}')[2]}", count=len(attribute_rows))
+        _style = str(style) if style else None
+        _extra = {str(k): str(v) for k, v in kwargs.items()}
+        if self.canvas is not None:
+            _ids = self.canvas.new_ids(len(attribute_rows), prefix=id_prefix)
+        else:
+            _ids = new_ids(len(attribute_rows), prefix=id_prefix)
+        _parent = self.elem
+        _sub_element = etree.SubElement
+        elems = []
+        for _id, row in zip(_ids, attribute_rows):
+            attrib = {'id': _id}
+            if _style:
+                attrib['style'] = _style
+            attrib.update(row)
+            attrib.update(_extra)
+            elems.append(_sub_element(_parent, tag_name, attrib))
+        if self.canvas is not None:
+            self.canvas._index_elements(elems, _parent)
+        return elems
+
+    def lines(self, pairs, style=DEFAULT_LINESTYLE, id_prefix='__pyinkscape_line', **kwargs):
+        ''' Draw many lines at once
+
+        :param pairs: A sequence of (from_point, to_point) pairs, or of (x1, y1, x2, y2) rows (e.g. an (n, 4) NumPy array)
+        :returns: A list of the new line XML elements, the same type as returned by :meth:`line`
+        '''
+        if hasattr(pairs, 'tolist'):
+            pairs = pairs.tolist()
+        rows = []
+        for pair in pairs:
+            if len(pair) == 4:
+                x1, y1, x2, y2 = pair
+            else:
+                (x1, y1), (x2, y2) = _as_rows(pair)
+            rows.append({'x1': str(x1), 'y1': str(y1), 'x2': str(x2), 'y2': str(y2)})
+        return self._new_many("line", rows, style=style, id_prefix=id_prefix, **kwargs)
+
+    def rects(self, topleft, sizes, style=DEFAULT_LINESTYLE, id_prefix='__pyinkscape_rect', **kwargs):
+        ''' Draw many rectangles at once
+
+        :param topleft: A sequence of top-left points (or an (n, 2) NumPy array)
+        :param sizes: A (width, height) pair for all rectangles, or a sequence of pairs
+        :returns: A list of the new rect XML elements, the same type as returned by :meth:`rect`
+        '''
+        topleft = _as_rows(topleft)
+        if isinstance(sizes, Dimension):
+            sizes = (sizes.width, sizes.height)
+        if hasattr(sizes, 'tolist'):
+            sizes = sizes.tolist()
+        if len(sizes) == 2 and isinstance(sizes[0], (int, float)):
+            sizes = [sizes] * len(topleft)
+        sizes = [(s.width, s.height) if isinstance(s, Dimension) else s for s in _broadcast(sizes, len(topleft))]
+        rows = [{'x': str(x), 'y': str(y), 'width': str(w), 'height': str(h)} for (x, y), (w, h) in zip(topleft, sizes)]
+        return self._new_many("rect", rows, style=style, id_prefix=id_prefix, **kwargs)
+
+    def circles(self, centers, radii, style=DEFAULT_LINESTYLE, id_prefix='__pyinkscape_circle', **kwargs):
+        ''' Draw many circles at once
+
+        >>> layer.circles([(10, 10), (20, 20), (30, 30)], 2)
+        >>> layer.circles(numpy.random.rand(50000, 2) * 100, radii=numpy.random.rand(50000))
+
+        :param centers: A sequence of center points (or an (n, 2) NumPy array)
+        :param radii: A radius for all circles, or a sequence of radii
+        :returns: A list of the new circle XML elements. Unlike :meth:`circle`, the elements are not wrapped
+                  in :class:`Circle` objects to keep bulk drawing fast, use ``Circle(elem)`` when needed.
+        '''
+        centers = _as_rows(centers)
+        radii = _broadcast(radii, len(centers))
+        rows = [{'cx': str(x), 'cy': str(y), 'r': str(r)} for (x, y), r in zip(centers, radii)]
+        return self._new_many("circle", rows, style=style, id_prefix=id_prefix, **kwargs)
+
 
 class Shape:
     def __init__(self, elem):
@@ -367,13 +595,262 @@ class Path(Shape):
     pass
 
 
+class _ElementIndex:
+
+    ''' Lookup tables of a canvas: element ID -> element and inkscape:label -> [elements]
+
+    Both tables follow document order, i.e. the first element of a duplicated ID wins
+    and elements sharing a label are listed in the order they appear in the file.
+    '''
+
+    def __init__(self, root):
+        self.ids = {}
+        self.labels = {}
+        for elem in root.iter():
+            self.add(elem)
+
+    def add(self, elem):
+        _id = elem.get('id')
+        if _id is not None:
+            self.ids.setdefault(_id, elem)
+        _label = elem.get(INKSCAPE_LABEL)
+        if _label is not None:
+            self.labels.setdefault(_label, []).append(elem)
+
+    def remove(self, elem):
+        ''' Remove an element and all of its descendants '''
+        for e in elem.iter():
+            _id = e.get('id')
+            if _id is not None and self.ids.get(_id) is e:
+                del self.ids[_id]
+            _label = e.get(INKSCAPE_LABEL)
+            if _label in self.labels:
+                _elems = [x for x in self.labels[_label] if x is not e]
+                if _elems:
+                    self.labels[_label] = _elems
+                else:
+                    del self.labels[_label]
+
+
+def _svg_parser(remove_blank_text=True, **kwargs):
+    if _LXML_AVAILABLE:
+        kwargs['remove_blank_text'] = remove_blank_text  # this flag is lxml specific
+    parser = XMLParser(**kwargs)
+    if not _LXML_AVAILABLE:
+        for k, v in SVG_NAMESPACES.items():
+            etree.register_namespace(k, v)
+        # register SVG as the default namespace
+        etree.register_namespace('', SVG_NS)
+    return parser
+
+
+def _parse_svg(filepath, remove_blank_text=True, encoding="utf-8", **kwargs):
+    ''' Parse an SVG file into an element tree using the available XML backend '''
+    with open(filepath, encoding=encoding) as infile:
+        return etree.parse(infile, _svg_parser(remove_blank_text, **kwargs))
+
+
+def _parse_svg_bytes(content, remove_blank_text=True, **kwargs):
+    ''' Parse serialized SVG content (bytes) into an element tree '''
+    return etree.ElementTree(etree.fromstring(content, _svg_parser(remove_blank_text, **kwargs)))
+
+
+def _text_lines(elem):
+    ''' Get the flowPara elements of a flowRoot or the tspan elements of a text element '''
+    if elem is None or not isinstance(elem.tag, str):
+        return []
+    _tag = elem.tag.rsplit('}', 1)[-1]
+    if _tag == 'flowRoot':
+        return elem.findall('ns:flowPara', namespaces=SVG_NAMESPACES)
+    elif _tag == 'text':
+        elems = elem.findall('ns:tspan', namespaces=SVG_NAMESPACES)
+        getLogger().debug(f"Found: {elems}")
+        return elems
+    return []
+
+
+def _stream_position(target):
+    ''' Position of a seekable stream or size of a file path, or None if unknown '''
+    try:
+        if hasattr(target, 'tell'):
+            return target.tell()
+        return os.path.getsize(target) if os.path.isfile(target) else 0
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def _copy_tree(tree):
+    ''' Deep copy a parsed element tree so that the copy shares no elements with the original '''
+    if _LXML_AVAILABLE:
+        return copy.deepcopy(tree)
+    else:
+        return etree.ElementTree(_copy_element(tree.getroot()))
+
+
+def _copy_element(elem):
+    ''' Structural copy of an ElementTree element, about 3 times faster than copy.deepcopy() '''
+    _sub_element = etree.SubElement
+    root = elem.makeelement(elem.tag, elem.attrib)
+    root.text, root.tail = elem.text, elem.tail
+    stack = [(elem, root)]
+    while stack:
+        source, target = stack.pop()
+        for child in source:
+            _copy = _sub_element(target, child.tag, child.attrib)
+            _copy.text, _copy.tail = child.text, child.tail
+            if len(child):
+                stack.append((child, _copy))
+    return root
+
+
+_XPATH_VARIABLE = re.compile(r'\$([A-Za-z_][\w.-]*)')
+
+
+@functools.lru_cache(maxsize=256)
+def _compiled_xpath(query):
+    ''' Compile an XPath expression with the SVG namespaces once and reuse it (lxml only) '''
+    return etree.XPath(query, namespaces=SVG_NAMESPACES)
+
+
+def _bind_variables(query, variables):
+    ''' Substitute $name variables of an ElementPath query with quoted string literals
+
+    ElementTree has no XPath variables, so this is how parameterized queries are
+    supported on the fallback backend.
+    '''
+    def _literal(match):
+        name = match.group(1)
+        if name not in variables:
+            raise ValueError(f"Undefined XPath variable ${name}")
+        value = str(variables[name])
+        if "'" not in value:
+            return f"'{value}'"
+        elif '"' not in value:
+            return f'"{value}"'
+        raise ValueError(f"Value of ${name} cannot contain both single and double quotes on ElementTree")
+    return _XPATH_VARIABLE.sub(_literal, query)
+
+
+def _tag_matcher(tag):
+    ''' Build a predicate for element tags
+
+    A qualified tag ('{ns}text') must match exactly, while a local name ('text') matches
+    in any namespace, so both parsed and newly drawn elements are found.
+    '''
+    if tag is None:
+        return lambda e: isinstance(e.tag, str)
+    elif '}' in tag:
+        return lambda e: e.tag == tag
+    return lambda e: isinstance(e.tag, str) and e.tag.rsplit('}', 1)[-1] == tag
+
+
+def _iter_tag(elem, tag=None):
+    ''' Lazily iterate an element and its descendants with a tag in document order (see :func:`_tag_matcher`) '''
+    if _LXML_AVAILABLE and tag is not None:
+        # filtered by lxml itself, {*} matches any namespace or no namespace
+        return elem.iter(tag if '}' in tag else f'{{*}}{tag}')
+    return filter(_tag_matcher(tag), elem.iter())
+
+
+class TemplateCache:
+
+    ''' A thread-safe LRU cache of parsed SVG templates
+
+    Each file is parsed once and keyed by its real path, modification time, size and parser options.
+    Every lookup returns a fresh deep copy of the cached tree, so documents never share elements.
+
+    A parsed tree takes several times the size of its file in memory, so the cache is also
+    bounded by the total size of the cached files, and large files are never cached.
+
+    >>> cache = TemplateCache(maxsize=8)
+    >>> tree = cache.get('/path/to/template.svg')
+    >>> cache.stats()
+    {'hits': 0, 'misses': 1, 'size': 1, 'maxsize': 8}
+
+    :param maxsize: Maximum number of cached templates
+    :param max_bytes: Maximum total size of the cached files, in bytes
+    :param max_file_size: Files larger than this (in bytes) are parsed directly without caching
+    '''
+
+    def __init__(self, maxsize=32, max_bytes=8 * 1024 ** 2, max_file_size=1024 ** 2):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.hits = 0
+        self.misses = 0
+        self.__trees = OrderedDict()
+        self.__nbytes = 0  # total file size of the cached trees
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__trees)
+
+    @staticmethod
+    def make_key(filepath, **options):
+        ''' Build a cache key for a file, or return None if the parser options cannot be hashed '''
+        _options = tuple(sorted(options.items()))
+        try:
+            hash(_options)
+        except TypeError:
+            return None
+        _stat = os.stat(filepath)
+        return (os.path.realpath(filepath), _stat.st_mtime_ns, _stat.st_size, _options)
+
+    def get(self, filepath, **options):
+        ''' Get a private copy of the parsed tree of an SVG file
+
+        :param filepath: Path to an SVG file
+        :param options: Keyword arguments for parsing (encoding, remove_blank_text, XMLParser options)
+        '''
+        key = self.make_key(filepath, **options)
+        if key is None or not self.maxsize or key[2] > min(self.max_file_size, self.max_bytes):
+            # nothing can be cached, parse the file directly
+            with self.__lock:
+                self.misses += 1
+            return _parse_svg(filepath, **options)
+        with self.__lock:
+            tree = self.__trees.get(key)
+            if tree is not None:
+                self.__trees.move_to_end(key)
+                self.hits += 1
+        if tree is None:
+            tree = _parse_svg(filepath, **options)
+            with self.__lock:
+                self.misses += 1
+                # drop stale versions of the same file
+                for _key in [k for k in self.__trees if k[0] == key[0] and k != key]:
+                    del self.__trees[_key]
+                    self.__nbytes -= _key[2]
+                if key not in self.__trees:
+                    self.__trees[key] = tree
+                    self.__nbytes += key[2]
+                while len(self.__trees) > self.maxsize or self.__nbytes > self.max_bytes:
+                    _key, _ = self.__trees.popitem(last=False)
+                    self.__nbytes -= _key[2]
+        return _copy_tree(tree)
+
+    def clear(self):
+        ''' Remove all cached templates and reset hit/miss counters '''
+        with self.__lock:
+            self.__trees.clear()
+            self.__nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.__trees), 'maxsize': self.maxsize}
+
+
+TEMPLATE_CACHE = TemplateCache()
+
+
 class Canvas:
 
     ''' This class represents an Inkscape drawing page (i.e. a SVG file) '''
 
     FILEPATH_MEMORY = ':memory:'
     
-    def __init__(self, filepath=FILEPATH_MEMORY, *args, **kwargs):
+    def __init__(self, filepath=FILEPATH_MEMORY, *args, use_cache=True, id_allocator=None, check_ids=False, **kwargs):
         ''' Create a new blank canvas or read from an existing file.
 
         To create a blank canvas, just ignore the filepath property.
@@ -382,8 +859,16 @@ class Canvas:
         To open an existing file, use
         >>> c = Canvas("/path/to/file.svg")
 
+        Parsed files (up to 1MB each) are kept in :data:`TEMPLATE_CACHE`, so opening the same template again
+        only costs a deep copy of the cached tree. Use `use_cache=False` to always re-parse.
+
         :param filepath: Path to an existing SVG file.
         :type filepath: str
+        :param use_cache: Reuse parsed templates from :data:`TEMPLATE_CACHE`
+        :type use_cache: bool
+        :param id_allocator: ID generator for new elements (e.g. a :class:`SequentialIDAllocator`), default to the process-wide allocator
+        :param check_ids: Skip generated IDs that are already used in this canvas
+        :type check_ids: bool
         '''
         self.__filepath = filepath
         self.__tree = None
@@ -394,22 +879,69 @@ class Canvas:
         self.__viewbox = None
         self.__scale = 1.0
         self.__elem_group_map = dict()
+        self.__index = None
+        self.__parents = None  # child -> parent map, only used without lxml
+        self.__id_allocator = id_allocator
+        self.check_ids = check_ids
         if filepath is not None:
-            self.__load_file(*args, **kwargs)
-
-    def __load_file(self, remove_blank_text=True, encoding="utf-8", **kwargs):
-        with open(_BLANK_CANVAS if self.__filepath == Canvas.FILEPATH_MEMORY else self.__filepath, encoding=encoding) as infile:
-            if _LXML_AVAILABLE:
-                kwargs['remove_blank_text'] = remove_blank_text  # this flag is lxml specific
-            parser = XMLParser(**kwargs)
-            if not _LXML_AVAILABLE:
-                for k, v in SVG_NAMESPACES.items():
-                    etree.register_namespace(k, v)
-                # register SVG as the default namespace
-                etree.register_namespace('', SVG_NS)
-            self.__tree = etree.parse(infile, parser)
-            self.__root = self.__tree.getroot()
-            self.__update_vsg_info()
+            if instrument.enabled:
+                with instrument.timed('canvas.load', path=str(filepath), cached=use_cache):
+                    self.__load_file(*args, use_cache=use_cache, **kwargs)
+            else:
+                self.__load_file(*args, use_cache=use_cache, **kwargs)
+
+    @classmethod
+    def _from_tree(cls, tree, filepath=FILEPATH_MEMORY, **kwargs):
+        ''' Wrap an already parsed element tree (the canvas takes ownership of it) '''
+        canvas = cls(None, **kwargs)
+        canvas.__filepath = filepath
+        canvas.__tree = tree
+        canvas.__root = tree.getroot()
+        canvas.__update_vsg_info()
+        return canvas
+
+    def copy(self, id_allocator=None):
+        ''' Create an independent copy of this canvas without serializing and re-parsing it
+
+        The element tree is deep-copied (a C-level copy with lxml or ElementTree's C accelerator)
+        and the parsed document information (units, size, viewBox, scale) is carried over.
+        Indexes of the copy are built lazily on its first lookup.
+
+        >>> base = Canvas("template.svg")
+        >>> ...  # prepare the base canvas once
+        >>> for record in records:
+        ...     c = base.fork(id_allocator=SequentialIDAllocator())
+
+        :param id_allocator: ID generator of the copy, default to the allocator of this canvas
+        '''
+        canvas = Canvas(None, id_allocator=self.__id_allocator if id_allocator is None else id_allocator, check_ids=self.check_ids)
+        canvas.__filepath = self.__filepath
+        canvas.__tree = _copy_tree(self.__tree)
+        canvas.__root = canvas.__tree.getroot()
+        canvas.__units = self.__units
+        canvas.__width = self.__width
+        canvas.__height = self.__height
+        _vb = self.__viewbox
+        canvas.__viewbox = BBox(_vb.x1, _vb.y1, _vb.width, _vb.height) if _vb is not None else None
+        canvas.__scale = self.__scale
+        return canvas
+
+    fork = copy
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def __load_file(self, remove_blank_text=True, encoding="utf-8", use_cache=True, **kwargs):
+        _filepath = _BLANK_CANVAS if self.__filepath == Canvas.FILEPATH_MEMORY else self.__filepath
+        if use_cache:
+            self.__tree = TEMPLATE_CACHE.get(_filepath, remove_blank_text=remove_blank_text, encoding=encoding, **kwargs)
+        else:
+            self.__tree = _parse_svg(_filepath, remove_blank_text=remove_blank_text, encoding=encoding, **kwargs)
+        self.__root = self.__tree.getroot()
+        self.__update_vsg_info()
 
     def __update_vsg_info(self):
         # load SVG information
@@ -427,18 +959,127 @@ class Canvas:
         if self.viewBox and self.__width:
             self.__scale = self.viewBox.width / self.__width
 
-    def __parent_map(self):
-        return {c: p for p in self.__tree.iter() for c in p}
+    def _copy_tree(self):
+        ''' Get a deep copy of the element tree of this canvas '''
+        return _copy_tree(self.__tree)
+
+    def _parent_of(self, elem):
+        ''' Get the parent of an element
+
+        ElementTree elements do not know their parents, so a child -> parent map
+        is built once per canvas and then maintained when elements are added or removed.
+        The map is rebuilt when an element is missing from it, e.g. after it was added
+        to the tree outside of pyinkscape.
+        '''
+        if _LXML_AVAILABLE:
+            return elem.getparent()
+        if self.__parents is None or (elem not in self.__parents and elem is not self.__root):
+            self.__parents = {c: p for p in self.__root.iter() for c in p}
+        return self.__parents.get(elem)
 
     def __build_group(self, elem):
         if elem not in self.__elem_group_map:
-            if _LXML_AVAILABLE:
-                _group_obj = Group(elem, elem.getparent())
-            else:
-                _group_obj = Group(elem, self.__parent_map()[elem])
-            self.__elem_group_map[elem] = _group_obj
+            self.__elem_group_map[elem] = Group(elem, self._parent_of(elem), canvas=self)
         return self.__elem_group_map[elem]
 
+    @property
+    def __elem_index(self):
+        if self.__index is None:
+            self.__index = _ElementIndex(self.__root)
+        return self.__index
+
+    def reindex(self):
+        ''' Discard the ID/label index so that it is rebuilt on the next lookup
+
+        Elements created or deleted through :class:`Group` keep the index up to date,
+        and lookups that find a renamed or removed element rebuild it by themselves.
+        Call this method after adding or removing elements of the underlying element tree directly.
+        '''
+        self.__rebuild_index()
+        self.__elem_group_map.clear()
+
+    def __rebuild_index(self):
+        self.__index = None
+        self.__parents = None
+
+    def _index_element(self, elem, parent):
+        if self.__index is not None:
+            self.__index.add(elem)
+        if self.__parents is not None:
+            self.__parents[elem] = parent
+            for p in elem.iter():
+                for c in p:
+                    self.__parents[c] = p
+
+    def _index_elements(self, elems, parent):
+        ''' Index many new (childless) elements of the same parent '''
+        if self.__index is not None:
+            for elem in elems:
+                self.__index.add(elem)
+        if self.__parents is not None:
+            self.__parents.update(dict.fromkeys(elems, parent))
+
+    def _unindex(self, elem):
+        if self.__index is not None:
+            self.__index.remove(elem)
+        for e in elem.iter():
+            self.__elem_group_map.pop(e, None)
+            if self.__parents is not None:
+                self.__parents.pop(e, None)
+
+    def __attached(self, elem):
+        ''' Check if an element is still part of this canvas
+
+        With ElementTree, the ancestors are looked up in the maintained parent map, so
+        elements removed outside of pyinkscape are only detected after :meth:`reindex`.
+        '''
+        while elem is not None:
+            if elem is self.__root:
+                return True
+            elem = self._parent_of(elem)
+        return False
+
+    def new_ids(self, count, prefix=None):
+        ''' Generate `count` new element IDs using the ID allocator of this canvas '''
+        if self.__id_allocator is None:
+            ids = new_ids(count, prefix=prefix)
+        else:
+            _template = (prefix or '_pyinkscape_') + '_{}'
+            ids = [_template.format(x) for x in self.__id_allocator.take(count)]
+        if self.check_ids:
+            _used = self.__elem_index.ids
+            ids = [x for x in ids if x not in _used]
+            if len(ids) < count:
+                ids += self.new_ids(count - len(ids), prefix=prefix)
+        return ids
+
+    def new_id(self, prefix=None):
+        ''' Generate a new element ID using the ID allocator of this canvas '''
+        if self.__id_allocator is None and not self.check_ids:
+            return new_id(prefix=prefix)
+        return self.new_ids(1, prefix=prefix)[0]
+
+    def element_by_id(self, id):
+        ''' Find an element (of any type) by its ID
+
+        :returns: An XML element if found, or None
+        '''
+        elem = self.__elem_index.ids.get(id)
+        if elem is None or (elem.get('id') == id and self.__attached(elem)):
+            return elem
+        # renamed or removed outside of pyinkscape
+        self.__rebuild_index()
+        return self.__elem_index.ids.get(id)
+
+    def elements_by_label(self, label):
+        ''' Find all elements (of any type) with an Inkscape label, in document order '''
+        elems = self.__elem_index.labels.get(label, [])
+        if all(e.get(INKSCAPE_LABEL) == label and self.__attached(e) for e in elems):
+            return list(elems)
+        # relabelled or removed outside of pyinkscape
+        self.__rebuild_index()
+        return list(self.__elem_index.labels.get(label, []))
+
     @property
     def __svg_node(self):
         return self.__root
@@ -485,19 +1126,97 @@ class Canvas:
         return Canvas(filepath=filepath, encoding=encoding, remove_blank_text=remove_blank_text, **kwargs)
 
     def to_xml_string(self, encoding="utf-8", pretty_print=True, **kwargs):
+        _start = perf_counter() if instrument.enabled else None
         if _LXML_AVAILABLE:
-            return etree.tostring(self.__root, encoding=encoding, pretty_print=pretty_print, **kwargs).decode('utf-8')
+            content = etree.tostring(self.__root, encoding=encoding, pretty_print=pretty_print, **kwargs)
         else:
-            return etree.tostring(self.__root, encoding=encoding, **kwargs).decode('utf-8')
+            content = etree.tostring(self.__root, encoding=encoding, **kwargs)
+        if _start is not None:
+            instrument.emit('canvas.serialize', perf_counter() - _start, nbytes=len(content))
+        return content.decode('utf-8')
 
     def __str__(self):
         return self.to_xml_string()
 
-    def _xpath_query(self, query_string, namespaces=None):
-        if _LXML_AVAILABLE:
-            return self.__root.xpath(query_string, namespaces=namespaces) 
+    def _xpath_query(self, query_string, namespaces=None, **variables):
+        _start = perf_counter() if instrument.enabled else None
+        if not _LXML_AVAILABLE:
+            if variables:
+                query_string = _bind_variables(query_string, variables)
+            results = self.__tree.findall(query_string, namespaces=namespaces)
+        elif namespaces is None or namespaces == SVG_NAMESPACES:
+            results = _compiled_xpath(query_string)(self.__root, **variables)
+        else:
+            results = self.__root.xpath(query_string, namespaces=namespaces, **variables)
+        if _start is not None:
+            instrument.emit('canvas.xpath', perf_counter() - _start, query=query_string)
+        return results
+
+    def xpath(self, query, **variables):
+        ''' Run an XPath query against the root svg element
+
+        Queries are compiled once and reused, so pass changing values as XPath variables
+        instead of formatting them into the query, e.g.
+        ``canvas.xpath(".//ns:text[@inkscape:label=$name]", name="Title")``.
+        On ElementTree only the ElementPath subset of XPath is supported.
+
+        :param query: An XPath query, the prefixes ns (SVG), inkscape, sodipodi, etc. are available
+        :param variables: Values of the $variables used in the query
+        :returns: A list of results
+        '''
+        return self._xpath_query(query, namespaces=SVG_NAMESPACES, **variables)
+
+    def iterfind(self, tag=None, id=None, label=None, layer=None):
+        ''' Lazily iterate elements matching all of the given criteria in document order
+
+        ID and label lookups use the index of this canvas, other searches stop as soon as
+        the caller stops iterating.
+
+        :param tag: Tag name such as 'text', matched in any namespace, or a qualified tag such as '{http://www.w3.org/2000/svg}text'
+        :param id: Element ID
+        :param label: Inkscape label
+        :param layer: Only search inside a layer, given as a `Group` object, a layer name or a layer ID
+        :returns: A generator of XML elements
+        '''
+        scope = self.__root
+        if layer is not None:
+            if not isinstance(layer, Group):
+                layer = self.layer(layer) or self.layer_by_id(layer)
+                if layer is None:
+                    return
+            scope = layer.elem
+        if id is None and label is None:
+            for elem in _iter_tag(scope, tag):
+                if elem is not scope or layer is None:
+                    yield elem
+            return
+        match_tag = _tag_matcher(tag)
+        if id is not None:
+            elem = self.element_by_id(id)
+            candidates = [elem] if elem is not None else []
         else:
-            return self.__tree.findall(query_string, namespaces=namespaces)
+            candidates = self.elements_by_label(label)
+        for elem in candidates:
+            if label is not None and elem.get(INKSCAPE_LABEL) != label:
+                continue
+            if match_tag(elem) and (layer is None or self.__inside(elem, scope)):
+                yield elem
+
+    def find(self, tag=None, id=None, label=None, layer=None):
+        ''' Find the first element matching all of the given criteria (see :meth:`iterfind`)
+
+        :returns: An XML element if found, or None
+        '''
+        return next(self.iterfind(tag=tag, id=id, label=label, layer=layer), None)
+
+    def __inside(self, elem, ancestor):
+        ''' Check if an element is a descendant of another element '''
+        elem = self._parent_of(elem)
+        while elem is not None:
+            if elem is ancestor:
+                return True
+            elem = self._parent_of(elem)
+        return False
 
     def groups(self, layer_only=False):
         if layer_only:
@@ -507,32 +1226,23 @@ class Canvas:
         return [self.__build_group(g) for g in groups]
 
     def group(self, name, layer_only=False):
-        if layer_only:
-            if _LXML_AVAILABLE:
-                groups = self._xpath_query(f".//ns:g[@inkscape:groupmode='layer' and @inkscape:label='{name}']", namespaces=SVG_NAMESPACES)
-            else:
-                groups = self._xpath_query(f".//ns:g[@inkscape:groupmode='layer'][@inkscape:label='{name}']", namespaces=SVG_NAMESPACES)
+        for elem in self.elements_by_label(name):
+            if elem.tag == SVG_GROUP_TAG and (not layer_only or elem.get(INKSCAPE_GROUPMODE) == 'layer'):
+                return self.__build_group(elem)
+        # some groups in Inkscape have empty name and use ID as name instead
+        _try_group = self.group_by_id(name, layer_only=layer_only)
+        if _try_group and not _try_group.label:
+            return _try_group
         else:
-            groups = self._xpath_query(f".//ns:g[@inkscape:label='{name}']", namespaces=SVG_NAMESPACES)
-        if groups:
-            return self.__build_group(groups[0])
-        else:
-            # some groups in Inkscape have empty name and use ID as name instead
-            _try_group = self.group_by_id(name, layer_only=layer_only)
-            if _try_group and not _try_group.label:
-                return _try_group
-            else:
-                return None
+            return None
 
     def group_by_id(self, id, layer_only=False):
-        if layer_only:
-            if _LXML_AVAILABLE:
-                groups = self._xpath_query(f".//ns:g[@inkscape:groupmode='layer' and @id='{id}']", namespaces=SVG_NAMESPACES)
-            else:
-                groups = self._xpath_query(f".//ns:g[@inkscape:groupmode='layer'][@id='{id}']", namespaces=SVG_NAMESPACES)
-        else:
-            groups = self._xpath_query(f".//ns:g[@id='{id}']", namespaces=SVG_NAMESPACES)
-        return self.__build_group(groups[0]) if groups else None
+        elem = self.element_by_id(id)
+        if elem is None or elem.tag != SVG_GROUP_TAG:
+            return None
+        if layer_only and elem.get(INKSCAPE_GROUPMODE) != 'layer':
+            return None
+        return self.__build_group(elem)
 
     def layers(self):
         ''' Get all available layers in this canvas '''
@@ -560,21 +1270,84 @@ class Canvas:
         '''
         return self.group_by_id(id=id, layer_only=True)
 
-    def render(self, outpath, overwrite=False, encoding="utf-8"):
-        if not overwrite and os.path.isfile(outpath):
+    def new_layer(self, label, id=None):
+        ''' Add a new empty layer on top of all existing layers
+
+        :param label: Name of the new layer
+        :param id: ID of the new layer, a new ID is generated when it is not provided
+        :rtype: pyinkscape.inkscape.Group
+        '''
+        elem = etree.SubElement(self.__root, SVG_GROUP_TAG, {INKSCAPE_LABEL: label, INKSCAPE_GROUPMODE: 'layer'})
+        elem.set('id', id or self.new_id(prefix='layer'))
+        self._index_element(elem, self.__root)
+        return self.__build_group(elem)
+
+    def _split_output(self, parent_elem=None, encoding="utf-8", pretty_print=True):
+        ''' Serialize this canvas and split the output where a new last child of `parent_elem` would be
+
+        :param parent_elem: An element of this canvas, default to the root svg element
+        :returns: A (head, tail) pair of bytes
+        '''
+        parent_elem = self.__root if parent_elem is None else parent_elem
+        marker = etree.Comment(_SPLIT_MARKER)
+        parent_elem.append(marker)
+        try:
+            buf = io.BytesIO()
+            self.write(buf, encoding=encoding, pretty_print=pretty_print)
+        finally:
+            parent_elem.remove(marker)
+        parts = buf.getvalue().split(f"<!--{_SPLIT_MARKER}-->".encode(encoding))
+        if len(parts) != 2:
+            raise ValueError(f"Could not split the serialized canvas with encoding {encoding}")
+        return parts[0], parts[1]
+
+    def write(self, target, encoding="utf-8", pretty_print=True, **kwargs):
+        ''' Serialize this canvas directly into a file or a binary stream
+
+        Unlike :meth:`to_xml_string`, the document is streamed out by the XML backend
+        without building an intermediate string, so any binary file-like object
+        (an HTTP response, a `gzip.open()` stream, etc.) can be used as the target.
+
+        :param target: A file path or a binary file-like object
+        :param encoding: Output encoding
+        :param pretty_print: Indent output (only supported by lxml)
+        '''
+        _start = perf_counter() if instrument.enabled else None
+        # a file path is overwritten, so its new size is the number of bytes written
+        _offset = (_stream_position(target) if hasattr(target, 'write') else 0) if _start is not None else None
+        if _LXML_AVAILABLE:
+            self.__tree.write(target, encoding=encoding, pretty_print=pretty_print, **kwargs)
+        else:
+            self.__tree.write(target, encoding=encoding, **kwargs)
+        if _start is not None:
+            _end = _stream_position(target)
+            _nbytes = _end - _offset if _end is not None and _offset is not None else None
+            instrument.emit('canvas.serialize', perf_counter() - _start, nbytes=_nbytes)
+
+    def render(self, outpath, overwrite=False, encoding="utf-8", cache=None):
+        ''' Write this canvas to an SVG file
+
+        :param outpath: Path to the output file, or a binary file-like object to stream the SVG into
+        :param overwrite: Set to True to replace an existing file
+        :param cache: A :class:`pyinkscape.cache.ConversionCache`. An existing file with the same content is
+                      left untouched, and its content hash is remembered for converting it later.
+        '''
+        if hasattr(outpath, 'write'):
+            self.write(outpath, encoding=encoding)
+        elif not overwrite and os.path.isfile(outpath):
             getLogger().warning(f"File {outpath} exists. SKIPPED")
+        elif cache is not None:
+            buf = io.BytesIO()
+            self.write(buf, encoding=encoding)
+            if cache.write_if_changed(outpath, buf.getvalue()):
+                getLogger().info("Written output to {}".format(outpath))
+            else:
+                getLogger().info(f"File {outpath} is unchanged")
         else:
-            output = str(self)
-            with open(outpath, mode='w', encoding=encoding) as outfile:
-                outfile.write(output)
+            with open(outpath, mode='wb') as outfile:
+                self.write(outfile, encoding=encoding)
                 getLogger().info("Written output to {}".format(outfile.name))
 
     def getText(self, id):
-        elems = self._xpath_query("/ns:svg/ns:g/ns:flowRoot[@id='{id}']/ns:flowPara".format(id=id), namespaces=SVG_NAMESPACES)
-        if elems:
-            return elems
-        else:
-            # try get <text> element instead of flowRoot ...
-            elems = self._xpath_query("/ns:svg/ns:g/ns:text[@id='{id}']/ns:tspan".format(id=id), namespaces=SVG_NAMESPACES)
-            getLogger().debug(f"Found: {elems}")
-            return elems
+        ''' Get the text lines (flowPara or tspan elements) of a flowRoot or text element by ID '''
+        return _text_lines(self.element_by_id(id))
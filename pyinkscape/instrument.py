@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+Optional timing and counting of Canvas and render operations
+
+Latest version can be found at https://github.com/letuananh/pyinkscape
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+@license: MIT
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+########################################################################
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# Instrumentation is off until a sink is registered. Instrumented code only checks this flag,
+# so there is no timing or event allocation at all when it is False.
+enabled = False
+__sinks = []
+__local = threading.local()
+__lock = threading.Lock()
+__active = 0
+
+
+def getLogger():
+    return logging.getLogger(__name__)
+
+
+class Event:
+
+    ''' A timed or counted operation
+
+    Event names are dotted phases, e.g. `canvas.load`, `canvas.xpath`, `canvas.serialize`,
+    `element.circle`, `inkscape.export` or `pdf.merge`.
+    '''
+
+    __slots__ = ('name', 'duration', 'count', 'nbytes', 'info')
+
+    def __init__(self, name, duration=0.0, count=1, nbytes=None, info=None):
+        self.name = name
+        self.duration = duration
+        self.count = count
+        self.nbytes = nbytes
+        self.info = info or {}
+
+    def __repr__(self):
+        _bytes = f", nbytes={self.nbytes}" if self.nbytes is not None else ""
+        return f"Event({self.name}, duration={self.duration:.6f}, count={self.count}{_bytes}, info={self.info})"
+
+
+class PhaseStats:
+
+    ''' Aggregated events of one phase '''
+
+    __slots__ = ('count', 'calls', 'total', 'max', 'nbytes')
+
+    def __init__(self):
+        self.calls = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.nbytes = 0
+
+    def to_dict(self):
+        return {'calls': self.calls, 'count': self.count, 'total': self.total, 'max': self.max, 'nbytes': self.nbytes}
+
+    def __repr__(self):
+        return f"PhaseStats(calls={self.calls}, count={self.count}, total={self.total:.6f}s, max={self.max:.6f}s, nbytes={self.nbytes})"
+
+
+class Stats:
+
+    ''' An in-memory sink that aggregates events by name
+
+    >>> stats = Stats()
+    >>> add_sink(stats)
+    >>> ...
+    >>> stats['canvas.load'].total
+    '''
+
+    def __init__(self):
+        self.phases = {}
+        self.__lock = threading.Lock()
+
+    def __call__(self, event):
+        with self.__lock:
+            phase = self.phases.get(event.name)
+            if phase is None:
+                phase = self.phases[event.name] = PhaseStats()
+            phase.calls += 1
+            phase.count += event.count
+            phase.total += event.duration
+            if event.duration > phase.max:
+                phase.max = event.duration
+            if event.nbytes:
+                phase.nbytes += event.nbytes
+
+    def __getitem__(self, name):
+        return self.phases[name]
+
+    def __contains__(self, name):
+        return name in self.phases
+
+    @property
+    def elapsed(self):
+        ''' Total time of all recorded phases (nested phases are counted twice) '''
+        return sum(p.total for p in self.phases.values())
+
+    def summary(self):
+        ''' A JSON-friendly dictionary of all phases '''
+        return {name: phase.to_dict() for name, phase in sorted(self.phases.items())}
+
+    def report(self):
+        ''' A human readable table of all phases '''
+        lines = [f"{'phase':<24} {'calls':>8} {'count':>8} {'total (s)':>10} {'max (s)':>10} {'bytes':>12}"]
+        for name, p in sorted(self.phases.items()):
+            lines.append(f"{name:<24} {p.calls:>8} {p.count:>8} {p.total:>10.4f} {p.max:>10.4f} {p.nbytes:>12}")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"Stats({', '.join(self.phases)})"
+
+
+class LoggingSink:
+
+    ''' A sink that writes every event to a logger '''
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or getLogger()
+        self.level = level
+
+    def __call__(self, event):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%s took %.6fs (count=%s, nbytes=%s) %s",
+                            event.name, event.duration, event.count, event.nbytes, event.info)
+
+
+def __update(delta):
+    global enabled, __active
+    with __lock:
+        __active += delta
+        enabled = __active > 0
+
+
+def add_sink(sink):
+    ''' Send events of all threads to `sink`, a callable that accepts an :class:`Event` (e.g. a :class:`Stats` object) '''
+    __sinks.append(sink)
+    __update(1)
+    return sink
+
+
+def remove_sink(sink):
+    __sinks.remove(sink)
+    __update(-1)
+
+
+def emit(name, duration=0.0, count=1, nbytes=None, **info):
+    ''' Send an event to the registered sinks '''
+    if not enabled:
+        return
+    event = Event(name, duration, count, nbytes, info)
+    for sink in __sinks:
+        sink(event)
+    for sink in getattr(__local, 'sinks', ()):
+        sink(event)
+
+
+@contextmanager
+def timed(name, **info):
+    ''' Time a block of code as one event
+
+    The yielded dictionary can be used to add `count`, `nbytes` or extra information to the event.
+    '''
+    if not enabled:
+        yield {}
+        return
+    fields = dict(info)
+    _start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        emit(name, time.perf_counter() - _start, **fields)
+
+
+@contextmanager
+def profile(sink=None):
+    ''' Collect the events of the current thread, e.g. a summary of one document
+
+    >>> with profile() as stats:
+    ...     c = Canvas("template.svg")
+    ...     c.render("output.svg")
+    >>> print(stats.report())
+
+    :param sink: A sink to use instead of a new :class:`Stats` object
+    '''
+    sink = Stats() if sink is None else sink
+    if not hasattr(__local, 'sinks'):
+        __local.sinks = []
+    __local.sinks.append(sink)
+    __update(1)
+    try:
+        yield sink
+    finally:
+        __local.sinks.remove(sink)
+        __update(-1)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+Compact SVG path data encoder
+
+Latest version can be found at https://github.com/letuananh/pyinkscape
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+@license: MIT
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+########################################################################
+
+
+
+# ------------------------------------------------------------------------------
+# Number formatting
+# ------------------------------------------------------------------------------
+
+def format_number(value, precision=2):
+    ''' Format a number with at most `precision` decimals in its shortest form
+
+    >>> format_number(0.5), format_number(-0.25), format_number(12.3456), format_number(3.0)
+    ('.5', '-.25', '12.35', '3')
+    '''
+    s = '%.*f' % (precision, value)
+    if precision:
+        s = s.rstrip('0')
+        if s[-1] == '.':
+            s = s[:-1]
+    if s[0] == '0':
+        if len(s) > 1:
+            s = s[1:]  # 0.5 -> .5
+    elif s[:2] == '-0':
+        s = '-' + s[2:] if len(s) > 2 else '0'  # -0.5 -> -.5, -0 -> 0
+    return s
+
+
+def _needs_separator(previous, number):
+    ''' Check if two numbers need a separator between them when written one after another '''
+    if number[0] == '-':
+        return False
+    if number[0] == '.' and '.' in previous:
+        return False
+    return True
+
+
+# ------------------------------------------------------------------------------
+# Path builder
+# ------------------------------------------------------------------------------
+
+class PathBuilder:
+
+    ''' Accumulate SVG path commands into compact path data
+
+    Coordinates are rounded to `precision` decimals, each command is written either in absolute
+    or relative form (whichever is shorter, unless `relative` is True or False), repeated command
+    letters and unnecessary separators are dropped.
+
+    >>> p = PathBuilder(precision=1)
+    >>> p.move_to(10, 10).line_to(20, 10).line_to(20, 25.55).close()
+    >>> str(p)
+    'M10 10H20V25.6z'
+    >>> layer.path(p)  # PathBuilder objects can be drawn directly
+
+    :param precision: Number of decimals to keep
+    :param relative: True to always use relative commands, False to always use absolute commands, or "auto"
+    '''
+
+    def __init__(self, precision=2, relative='auto'):
+        self.precision = precision
+        self.relative = relative
+        self.__parts = []
+        self.__last_command = None
+        self.__last_number = None
+        self.__x = 0.0  # current point, rounded
+        self.__y = 0.0
+        self.__start = (0.0, 0.0)  # start of the current subpath
+
+    def __str__(self):
+        return ''.join(self.__parts)
+
+    def __len__(self):
+        return sum(len(x) for x in self.__parts)
+
+    @property
+    def current_point(self):
+        return (self.__x, self.__y)
+
+    def __round(self, value):
+        return round(value, self.precision)
+
+    def __numbers(self, values):
+        _precision = self.precision
+        return [format_number(v, _precision) for v in values]
+
+    def __encode(self, command, numbers):
+        ''' Encode a command with its formatted numbers, omitting the command letter when it repeats '''
+        _parts = []
+        if command == self.__last_command and command not in 'Mm':
+            if _needs_separator(self.__last_number, numbers[0]):
+                _parts.append(' ')
+        else:
+            _parts.append(command)
+        previous = None
+        for number in numbers:
+            if previous is not None and _needs_separator(previous, number):
+                _parts.append(' ')
+            _parts.append(number)
+            previous = number
+        return ''.join(_parts)
+
+    def __emit(self, command, absolute, relative):
+        ''' Write a command in its absolute or relative form (the relative command letter is lower-case) '''
+        if self.relative == 'auto':
+            _abs = self.__encode(command, self.__numbers(absolute))
+            _rel = self.__encode(command.lower(), self.__numbers(relative))
+            use_relative = len(_rel) < len(_abs)
+            _code = _rel if use_relative else _abs
+        else:
+            use_relative = bool(self.relative)
+            _code = self.__encode(command.lower() if use_relative else command,
+                                  self.__numbers(relative if use_relative else absolute))
+        self.__parts.append(_code)
+        self.__last_command = command.lower() if use_relative else command
+        self.__last_number = format_number((relative if use_relative else absolute)[-1], self.precision)
+        return self
+
+    def move_to(self, x, y):
+        x, y = self.__round(x), self.__round(y)
+        if not self.__parts:
+            self.__parts.append(self.__encode('M', self.__numbers((x, y))))
+            self.__last_number = format_number(y, self.precision)
+        else:
+            self.__emit('M', (x, y), (x - self.__x, y - self.__y))
+        # coordinate pairs following a moveto are implicit lineto commands
+        self.__last_command = 'l' if self.__last_command == 'm' else 'L'
+        self.__x, self.__y = x, y
+        self.__start = (x, y)
+        return self
+
+    def line_to(self, x, y):
+        x, y = self.__round(x), self.__round(y)
+        if x == self.__x:
+            self.__emit('V', (y,), (y - self.__y,))
+        elif y == self.__y:
+            self.__emit('H', (x,), (x - self.__x,))
+        else:
+            self.__emit('L', (x, y), (x - self.__x, y - self.__y))
+        self.__x, self.__y = x, y
+        return self
+
+    def lines(self, xs, ys):
+        ''' Draw a polyline through many points (the first point is used as a move_to if the path is empty) '''
+        for x, y in zip(xs, ys):
+            if not self.__parts:
+                self.move_to(x, y)
+            else:
+                self.line_to(x, y)
+        return self
+
+    def curve_to(self, x1, y1, x2, y2, x, y):
+        ''' Draw a cubic Bézier curve '''
+        _abs = [self.__round(v) for v in (x1, y1, x2, y2, x, y)]
+        _rel = [v - (self.__x if idx % 2 == 0 else self.__y) for idx, v in enumerate(_abs)]
+        self.__emit('C', _abs, _rel)
+        self.__x, self.__y = _abs[4], _abs[5]
+        return self
+
+    def arc_to(self, rx, ry, rotation, large_arc, sweep, x, y):
+        ''' Draw an elliptical arc '''
+        x, y = self.__round(x), self.__round(y)
+        _prefix = (self.__round(rx), self.__round(ry), self.__round(rotation), 1 if large_arc else 0, 1 if sweep else 0)
+        self.__emit('A', _prefix + (x, y), _prefix + (x - self.__x, y - self.__y))
+        self.__x, self.__y = x, y
+        return self
+
+    def close(self):
+        self.__parts.append('z')
+        self.__last_command = 'z'
+        self.__last_number = None
+        self.__x, self.__y = self.__start
+        return self
@@ -1,8 +1,18 @@
+import os
+import functools
+import itertools
 import logging
 import platform
+import queue
 import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+from . import instrument
+
 WIN_EXE_POTENTIAL_PATHS = [
     "C:\\Program Files\\Inkscape\\inkscape.exe",
     "C:\\Program Files\\Inkscape\\bin\\inkscape.exe"
@@ -17,26 +27,31 @@ if platform.system() == "Windows":
         INKSCAPE_PATH = "inkscape.exe"
 else:
     INKSCAPE_PATH = "/usr/bin/inkscape"
-
-try:
-    from PyPDF2 import PdfFileMerger
-    PYPDF2_ENABLED = True
-except Exception as e:
-    PYPDF2_ENABLED = False
+MERGE_CHUNK_SIZE = 256  # maximum number of PDF files to merge in one pass
 
 
 def getLogger():
     return logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=None)
+def _pdf_merger_class():
+    ''' Import PyPDF2 on demand, return its PdfFileMerger class or None if PyPDF2 is not available '''
+    try:
+        from PyPDF2 import PdfFileMerger
+    except ImportError:
+        return None
+    return PdfFileMerger
+
+
 def _verify_pypdf():
     ''' Verify that it is possible to merge PDF files with current setup (PyPDF2, pdfunite, etc.) '''
-    if not PYPDF2_ENABLED:
+    if _pdf_merger_class() is None:
         if platform.system() == "Windows":
-            logging.getLogger(__name__).error("pyInkscape requires PyPDF2 when running on Windows")
-            raise e
+            getLogger().error("pyInkscape requires PyPDF2 when running on Windows")
+            raise ImportError("PyPDF2 is required to merge PDF files on Windows")
         else:
-            logging.getLogger(__name__).warning("PyPDF2 is not available. PDF files will be merged using `pdfunite`")
+            getLogger().warning("PyPDF2 is not available. PDF files will be merged using `pdfunite`")
             # TODO: Verify that pdfunite is available at runtime
             return False
     else:
@@ -50,36 +65,466 @@ def prepare_output_dir(output_dir='ouput', mkdir=False):
     return output_dir
 
 
-def svg_to_pdf(filename, overwrite=False, inkscape_path=INKSCAPE_PATH):
-    ''' Convert an SVG file into PDF using Inkscape '''
-    _inkscape_path_obj = Path(inkscape_path)
-    if not _inkscape_path_obj.is_file():
-        getLogger().error(f"Inkscape binary is not available at {inkscape_path}")
+class ConversionResult:
+
+    ''' Outcome of converting one SVG file '''
+
+    def __init__(self, source, output, ok=True, skipped=False, error=None, cached=False):
+        self.source = source
+        self.output = output
+        self.ok = ok
+        self.skipped = skipped
+        self.error = error
+        self.cached = cached  # restored from a ConversionCache
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        _status = "skipped" if self.skipped else ("cached" if self.cached else ("ok" if self.ok else f"failed: {self.error}"))
+        return f"ConversionResult({self.source} -> {self.output}, {_status})"
+
+
+def _inkscape_command(inkscape_path):
+    ''' Build the command prefix to launch Inkscape
+
+    `inkscape_path` is either the path to an Inkscape binary or a sequence of arguments
+    (e.g. `[sys.executable, "fake_inkscape.py"]`) that behaves like one.
+    '''
+    if isinstance(inkscape_path, (str, Path)):
+        if not Path(inkscape_path).is_file():
+            getLogger().error(f"Inkscape binary is not available at {inkscape_path}")
+        return [str(inkscape_path)]
+    return [str(x) for x in inkscape_path]
+
+
+def _output_path(svg_file, export_type="pdf"):
+    svg_file = Path(svg_file)
+    return svg_file.parent / f"{svg_file.stem}.{export_type}"
+
+
+def _unlink_shared_output(output_path):
+    ''' Remove an output file that shares its content with other links before Inkscape writes to it
+
+    Inkscape rewrites existing files in place, which would also change an entry of a
+    :class:`pyinkscape.cache.ConversionCache` that the output was hardlinked to.
+    '''
+    try:
+        if os.stat(output_path).st_nlink > 1:
+            os.unlink(output_path)
+    except FileNotFoundError:
+        pass
+
+
+def svg_to_pdf(filename, overwrite=False, inkscape_path=INKSCAPE_PATH, cache=None):
+    ''' Convert an SVG file into PDF using Inkscape
+
+    :param cache: A :class:`pyinkscape.cache.ConversionCache` to reuse the PDF of identical SVG content
+    '''
     svg_file = Path(filename)
-    output_dir = svg_file.parent
-    pdf_file = output_dir / (svg_file.stem + ".pdf")
+    pdf_file = _output_path(svg_file, "pdf")
     if not overwrite and pdf_file.exists():
         getLogger().warning(f"WARNING: File {pdf_file} exists. SKIPPED")
-    else:
-        output = subprocess.run([inkscape_path, f"{svg_file}", f"--export-filename={pdf_file}", "--export-area-drawing"])
-        if output.returncode != 0:
-            getLogger().warning(f"Abnomal Inkscape exit code: {output.returncode}")
+        return ConversionResult(svg_file, pdf_file, skipped=True)
+    result = svg_export(svg_file, pdf_file, inkscape_path=inkscape_path, cache=cache)
+    if not result.ok:
+        getLogger().warning(result.error)
+    return result
+
+
+def is_up_to_date(filename, output_path):
+    ''' Check if an output file exists and is not older than its source file '''
+    output_path = Path(output_path)
+    try:
+        return output_path.stat().st_mtime_ns >= Path(filename).stat().st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def svg_export(filename, output_path=None, export_type="pdf", inkscape_path=INKSCAPE_PATH, export_area_drawing=True, cache=None):
+    ''' Export an SVG file using Inkscape command line and return a :class:`ConversionResult`
+
+    :param output_path: Path to the output file, default to the SVG path with `export_type` as extension
+    :param cache: A :class:`pyinkscape.cache.ConversionCache`, Inkscape is not run when it has the output already
+    '''
+    if output_path is None:
+        output_path = _output_path(filename, export_type)
+    _cache_key = None
+    if cache is not None:
+        _cache_key = cache.make_key(filename, export_type, inkscape_path, export_area_drawing=export_area_drawing)
+        if _cache_key is not None and cache.restore(_cache_key, output_path):
+            return ConversionResult(filename, output_path, cached=True)
+    _args = _inkscape_command(inkscape_path) + [f"{filename}", f"--export-filename={output_path}"]
+    if export_area_drawing:
+        _args.append("--export-area-drawing")
+    _unlink_shared_output(output_path)
+    try:
+        with instrument.timed('inkscape.export', source=str(filename)):
+            output = subprocess.run(_args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except OSError as e:
+        return ConversionResult(filename, output_path, ok=False, error=str(e))
+    if output.returncode != 0:
+        _error = output.stderr.decode('utf-8', errors='replace').strip()
+        return ConversionResult(filename, output_path, ok=False,
+                                error=f"Abnomal Inkscape exit code: {output.returncode}" + (f" ({_error})" if _error else ""))
+    if _cache_key is not None:
+        cache.store(_cache_key, output_path)
+    return ConversionResult(filename, output_path)
+
+
+def svg_to_pdf_many(filenames, workers=None, formats=("pdf",), overwrite=False,
+                    on_progress=None, on_error=None, inkscape_path=INKSCAPE_PATH, cache=None):
+    ''' Convert many SVG files concurrently, running at most `workers` Inkscape processes at a time
+
+    Outputs that are newer than their SVG files are skipped unless `overwrite` is True.
+
+    >>> def progress(result, done, total):
+    ...     print(f"[{done}/{total}] {result}")
+    >>> svg_to_pdf_many(svg_files, formats=('pdf', 'png'), on_progress=progress)
+
+    :param workers: Maximum number of concurrent Inkscape processes, default to the number of CPUs
+    :param formats: Export types, used as output file extensions
+    :param on_progress: Callback `on_progress(result, done, total)`, called after each output
+    :param on_error: Callback `on_error(result)`, called for each failed output
+    :param cache: A :class:`pyinkscape.cache.ConversionCache` shared by all conversions
+    :returns: A list of :class:`ConversionResult` objects, ordered by input file and then by format
+    '''
+    workers = max(1, workers or os.cpu_count() or 1)
+    results = []
+    tasks = []
+    for filename in filenames:
+        for export_type in formats:
+            output_path = _output_path(filename, export_type)
+            if not overwrite and is_up_to_date(filename, output_path):
+                results.append(ConversionResult(filename, output_path, skipped=True))
+            else:
+                results.append(None)
+                tasks.append((len(results) - 1, filename, output_path))
+    total = len(results)
+    done = 0
+    for result in results:
+        if result is not None:
+            done += 1
+            if on_progress:
+                on_progress(result, done, total)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(svg_export, filename, output_path, inkscape_path=inkscape_path, cache=cache): idx
+                   for idx, filename, output_path in tasks}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            done += 1
+            if not result.ok:
+                getLogger().warning(f"Could not convert {result.source}: {result.error}")
+                if on_error:
+                    on_error(result)
+            if on_progress:
+                on_progress(result, done, total)
+    return results
+
+
+class MergeStats:
+
+    ''' Statistics of a :func:`merge_pdf` run '''
+
+    def __init__(self):
+        self.inputs = 0
+        self.merges = 0
+        self.levels = 0
+        self.elapsed = 0.0
+        self.peak_memory = None
+
+    @property
+    def throughput(self):
+        ''' Number of input files merged per second '''
+        return self.inputs / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"MergeStats(inputs={self.inputs}, merges={self.merges}, levels={self.levels}, "
+                f"elapsed={self.elapsed:.3f}s, peak_memory={self.peak_memory})")
+
+
+def _peak_memory():
+    ''' Peak resident memory (in bytes) of this process and its finished children, if available '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    _peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return _peak if platform.system() == "Darwin" else _peak * 1024
 
 
-def merge_pdf(output_path, input_paths, **kwargs):
-    ''' Merge differnt PDF files into one '''
-    if _verify_pypdf():
-        merger = PdfFileMerger()
+def _merge_files(output_path, input_paths, use_pypdf=True):
+    ''' Merge a list of PDF files into one in a single pass, using PyPDF2 or `pdfunite` '''
+    if use_pypdf:
+        merger = _pdf_merger_class()()
         file_objects = []
-        for input_path in input_paths:
-            input_file = open(input_path, "rb")
-            file_objects.append(input_file)
-            merger.append(input_file)
-        with open(output_path, "wb") as output_file:
-            merger.write(output_file)
-        for file_obj in file_objects:
-            file_obj.close()
+        try:
+            for input_path in input_paths:
+                input_file = open(input_path, "rb")
+                file_objects.append(input_file)
+                merger.append(input_file)
+            with open(output_path, "wb") as output_file:
+                merger.write(output_file)
+        finally:
+            for file_obj in file_objects:
+                file_obj.close()
     else:
         # use pdfunite command to merge PDF files
-        subprocess.run(["pdfunite"] + input_paths + [output_path])
+        subprocess.run(["pdfunite"] + [str(p) for p in input_paths] + [str(output_path)])
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def merge_pdf(output_path, input_paths, chunk_size=MERGE_CHUNK_SIZE, tmp_dir=None, **kwargs):
+    ''' Merge differnt PDF files into one
+
+    Inputs are consumed lazily (`input_paths` can be a generator) and merged in chunks of
+    at most `chunk_size` files into intermediate files, which are then merged the same way
+    until one file is left (a tree merge). At most `chunk_size` input files are open at any time.
+
+    :param chunk_size: Maximum number of files merged in one pass
+    :param tmp_dir: Directory for intermediate files, default to the system temp directory
+    :returns: A :class:`MergeStats` object
+    '''
+    stats = MergeStats()
+    _start = time.perf_counter()
+    chunk_size = max(2, chunk_size)
+    _use_pypdf = _verify_pypdf()
+    with tempfile.TemporaryDirectory(prefix="pyinkscape_merge_", dir=tmp_dir) as _tmp_dir:
+        _level_inputs = input_paths
+        _previous = []
+        while True:
+            chunks = _chunked(_level_inputs, chunk_size)
+            first = next(chunks, None)
+            second = next(chunks, None)
+            if stats.levels == 0:
+                stats.inputs = len(first or ()) + len(second or ())
+            if second is None:
+                # the last merge goes straight into the output file
+                if first:
+                    _merge_files(output_path, first, use_pypdf=_use_pypdf)
+                    stats.merges += 1
+                else:
+                    getLogger().warning("There is no PDF file to merge")
+                break
+            _intermediates = []
+            for idx, chunk in enumerate(itertools.chain((first, second), chunks)):
+                if stats.levels == 0 and idx > 1:
+                    stats.inputs += len(chunk)
+                _path = Path(_tmp_dir) / f"level{stats.levels}_{idx}.pdf"
+                _merge_files(_path, chunk, use_pypdf=_use_pypdf)
+                _intermediates.append(_path)
+                stats.merges += 1
+            # intermediate files of the previous level are no longer needed
+            for _path in _previous:
+                _path.unlink()
+            _previous = _level_inputs = _intermediates
+            stats.levels += 1
+    stats.elapsed = time.perf_counter() - _start
+    stats.peak_memory = _peak_memory()
+    instrument.emit('pdf.merge', stats.elapsed, count=stats.inputs, merges=stats.merges, levels=stats.levels)
+    getLogger().debug(f"Merged PDF files into {output_path}: {stats}")
+    return stats
+
+
+class InkscapeShellError(RuntimeError):
+    pass
+
+
+class InkscapeShell:
+
+    ''' A long-lived Inkscape process running in `--shell` mode
+
+    Files are converted by sending actions (`file-open`, `export-filename`, `export-do`, ...)
+    to the same process, so Inkscape start-up is paid only once.
+
+    >>> with InkscapeShell() as shell:
+    ...     shell.export("chart.svg", "chart.pdf")
+    '''
+
+    PROMPT = b"> "
+
+    def __init__(self, inkscape_path=INKSCAPE_PATH, timeout=None):
+        '''
+        :param inkscape_path: Path to Inkscape binary, or a command sequence that speaks the shell protocol
+        :param timeout: Maximum number of seconds to wait for one command, the process is killed when exceeded
+        '''
+        self.inkscape_path = inkscape_path
+        self.timeout = timeout
+        self.__proc = None
+        self.__timed_out = False
+
+    @property
+    def alive(self):
+        return self.__proc is not None and self.__proc.poll() is None
+
+    def start(self):
+        ''' Start (or restart) the Inkscape process '''
+        self.close()
+        self.__proc = subprocess.Popen(_inkscape_command(self.inkscape_path) + ["--shell"],
+                                       stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL)
+        self.__read_until_prompt()
+        return self
+
+    def __read_until_prompt(self):
+        _buffer = bytearray()
+        _timer = None
+        if self.timeout:
+            self.__timed_out = False
+            _timer = threading.Timer(self.timeout, self.__kill_on_timeout)
+            _timer.start()
+        try:
+            while not _buffer.endswith(self.PROMPT):
+                chunk = self.__proc.stdout.read1(4096)
+                if not chunk:
+                    if self.__timed_out:
+                        raise InkscapeShellError(f"Inkscape shell did not respond within {self.timeout} seconds")
+                    raise InkscapeShellError(f"Inkscape shell exited unexpectedly (exit code: {self.__proc.wait()})")
+                _buffer.extend(chunk)
+        finally:
+            if _timer is not None:
+                _timer.cancel()
+        return _buffer[:-len(self.PROMPT)].decode('utf-8', errors='replace')
+
+    def __kill_on_timeout(self):
+        self.__timed_out = True
+        self.__proc.kill()
+
+    def command(self, *actions):
+        ''' Send a list of actions to Inkscape as one command line and return its output '''
+        if not self.alive:
+            self.start()
+        try:
+            self.__proc.stdin.write(("; ".join(actions) + "\n").encode('utf-8'))
+            self.__proc.stdin.flush()
+        except OSError as e:
+            raise InkscapeShellError(f"Could not send command to Inkscape shell: {e}") from e
+        return self.__read_until_prompt()
+
+    def export(self, filename, output_path, export_area_drawing=True):
+        ''' Export an SVG file into `output_path` (file type is decided by its extension) '''
+        for _path in (filename, output_path):
+            if ';' in str(_path):
+                raise ValueError(f"Inkscape shell cannot handle paths with semicolons ({_path})")
+        _actions = [f"file-open:{filename}", f"export-filename:{output_path}"]
+        if export_area_drawing:
+            _actions.append("export-area-drawing")
+        _actions += ["export-do", "file-close"]
+        _output = Path(output_path)
+        _unlink_shared_output(_output)
+        _mtime = _output.stat().st_mtime_ns if _output.exists() else None
+        with instrument.timed('inkscape.export', source=str(filename), shell=True):
+            self.command(*_actions)
+        if not _output.exists() or _output.stat().st_mtime_ns == _mtime:
+            return ConversionResult(filename, output_path, ok=False, error="Inkscape did not write any output")
+        return ConversionResult(filename, output_path)
+
+    def close(self):
+        ''' Stop the Inkscape process '''
+        if self.__proc is None:
+            return
+        if self.__proc.poll() is None:
+            try:
+                self.__proc.stdin.write(b"quit\n")
+                self.__proc.stdin.close()
+                self.__proc.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.__proc.kill()
+                self.__proc.wait()
+        self.__proc.stdout.close()
+        self.__proc = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class InkscapePool:
+
+    ''' A pool of long-lived Inkscape shells for converting many SVG files
+
+    Work is spread across the shells, shells that crash are restarted,
+    and every input file gets a :class:`ConversionResult`.
+
+    >>> with InkscapePool(workers=4) as pool:
+    ...     results = pool.convert(svg_files)
+    '''
+
+    def __init__(self, workers=None, inkscape_path=INKSCAPE_PATH, timeout=None, retries=1):
+        '''
+        :param workers: Number of Inkscape processes, default to the number of CPUs
+        :param timeout: Maximum number of seconds to convert one file
+        :param retries: How many times a file is retried after its Inkscape process crashed
+        '''
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.retries = retries
+        self.shells = [InkscapeShell(inkscape_path, timeout=timeout) for _ in range(self.workers)]
+
+    def __work(self, shell, tasks, results, export_area_drawing):
+        while True:
+            try:
+                idx, filename, output_path = tasks.get_nowait()
+            except queue.Empty:
+                return
+            for attempt in range(self.retries + 1):
+                try:
+                    results[idx] = shell.export(filename, output_path, export_area_drawing=export_area_drawing)
+                    break
+                except InkscapeShellError as e:
+                    getLogger().warning(f"Inkscape shell failed on {filename} ({e}), restarting it")
+                    shell.close()
+                    results[idx] = ConversionResult(filename, output_path, ok=False, error=str(e))
+                except Exception as e:
+                    results[idx] = ConversionResult(filename, output_path, ok=False, error=str(e))
+                    break
+
+    def convert(self, filenames, export_type="pdf", overwrite=False, export_area_drawing=True):
+        ''' Convert SVG files and return a list of results in input order
+
+        Output files are written next to their SVG files, with `export_type` as extension.
+        '''
+        tasks = queue.Queue()
+        results = []
+        for idx, filename in enumerate(filenames):
+            output_path = _output_path(filename, export_type)
+            if not overwrite and is_up_to_date(filename, output_path):
+                results.append(ConversionResult(filename, output_path, skipped=True))
+            else:
+                results.append(None)
+                tasks.put((idx, filename, output_path))
+        threads = [threading.Thread(target=self.__work, args=(shell, tasks, results, export_area_drawing), daemon=True)
+                   for shell in self.shells[:tasks.qsize()]]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def close(self):
+        for shell in self.shells:
+            shell.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 
+def svg_to_pdf_batch(filenames, overwrite=False, workers=None, inkscape_path=INKSCAPE_PATH, timeout=None):
+    ''' Convert many SVG files into PDF using a pool of Inkscape shells '''
+    with InkscapePool(workers=workers, inkscape_path=inkscape_path, timeout=timeout) as pool:
+        return pool.convert(filenames, export_type="pdf", overwrite=overwrite)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+Read-only streaming scan of large Inkscape SVG files
+
+Latest version can be found at https://github.com/letuananh/pyinkscape
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+@license: MIT
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+########################################################################
+
+import logging
+
+from .inkscape import etree, _LXML_AVAILABLE
+from .inkscape import Group, SVG_NS, SVG_GROUP_TAG, INKSCAPE_LABEL, INKSCAPE_GROUPMODE
+from .inkscape import _text_lines
+
+TEXT_TAGS = (f'{{{SVG_NS}}}text', f'{{{SVG_NS}}}flowRoot')
+
+
+def getLogger():
+    return logging.getLogger(__name__)
+
+
+class ScanEntry:
+
+    ''' A group, layer or text element found by :class:`SVGScan` '''
+
+    __slots__ = ('ID', 'tag', 'label', 'layer_id', 'is_layer')
+
+    def __init__(self, ID, tag, label=None, layer_id=None, is_layer=False):
+        self.ID = ID
+        self.tag = tag
+        self.label = label
+        self.layer_id = layer_id  # ID of the enclosing layer (the layer itself for layers)
+        self.is_layer = is_layer
+
+    def __repr__(self):
+        _kind = 'layer' if self.is_layer else self.tag.rsplit('}', 1)[-1]
+        return f"ScanEntry({_kind}, id={self.ID!r}, label={self.label!r})"
+
+
+class ReadOnlyGroup(Group):
+
+    ''' A layer parsed by :meth:`SVGScan.layer`, which does not belong to any canvas and cannot be modified '''
+
+    def __read_only(self, *args, **kwargs):
+        raise TypeError(f"Layer {self.label or self.ID!r} was loaded by SVGScan and is read-only, use Canvas to modify it")
+
+    new = _new_many = delete = __read_only
+
+
+def _iterparse(filepath):
+    ''' Stream the start and end events of an SVG file '''
+    if _LXML_AVAILABLE:
+        return etree.iterparse(str(filepath), events=('start', 'end'), huge_tree=True)
+    return etree.iterparse(str(filepath), events=('start', 'end'))
+
+
+class SVGScan:
+
+    ''' A read-only index of the layers, groups and text elements of an SVG file
+
+    The file is read in one streaming pass (`iterparse`) without building the document tree,
+    so memory use does not depend on the file size. Subtrees (e.g. one layer) are parsed
+    on demand with another streaming pass that only keeps the requested element.
+
+    >>> scan = SVGScan("huge.svg")
+    >>> [l.label for l in scan.layers()]
+    ['Background', 'Layer 1']
+    >>> layer = scan.layer('Layer 1')  # a read-only Group with the full subtree of this layer only
+    '''
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.__groups = []
+        self.__texts = []
+        self.__by_id = {}
+        self.__scan()
+
+    def __scan(self):
+        _layers = []  # stack of (element, layer ID) for enclosing layers
+        _parents = []
+        for event, elem in _iterparse(self.filepath):
+            if event == 'start':
+                _tag = elem.tag
+                entry = None
+                if _tag == SVG_GROUP_TAG:
+                    _id = elem.get('id')
+                    _is_layer = elem.get(INKSCAPE_GROUPMODE) == 'layer'
+                    if _is_layer:
+                        _layers.append((elem, _id))
+                    entry = ScanEntry(_id, _tag, elem.get(INKSCAPE_LABEL), _layers[-1][1] if _layers else None, _is_layer)
+                    self.__groups.append(entry)
+                elif _tag in TEXT_TAGS:
+                    entry = ScanEntry(elem.get('id'), _tag, elem.get(INKSCAPE_LABEL), _layers[-1][1] if _layers else None)
+                    self.__texts.append(entry)
+                if entry is not None and entry.ID is not None:
+                    self.__by_id.setdefault(entry.ID, entry)
+                _parents.append(elem)
+            else:
+                _parents.pop()
+                if _layers and _layers[-1][0] is elem:
+                    _layers.pop()
+                if _parents:
+                    # the element that just ended is always the last child of its parent
+                    del _parents[-1][-1]
+
+    def groups(self, layer_only=False):
+        ''' All groups (or only layers) in document order '''
+        return [g for g in self.__groups if g.is_layer] if layer_only else list(self.__groups)
+
+    def layers(self):
+        return self.groups(layer_only=True)
+
+    def texts(self, layer=None):
+        ''' All text and flowRoot elements, optionally only the ones in a layer (name or ID) '''
+        if layer is None:
+            return list(self.__texts)
+        _layer = self.find(layer, layer_only=True)
+        if _layer is None:
+            return []
+        return [t for t in self.__texts if t.layer_id == _layer.ID]
+
+    def find(self, name, layer_only=False):
+        ''' Find the first group (or layer) by label, or by ID for groups without labels '''
+        for g in self.__groups:
+            if g.label == name and (g.is_layer or not layer_only):
+                return g
+        entry = self.__by_id.get(name)
+        if entry is not None and entry.tag == SVG_GROUP_TAG and not entry.label and (entry.is_layer or not layer_only):
+            return entry
+        return None
+
+    def entry_by_id(self, id):
+        return self.__by_id.get(id)
+
+    def element(self, id):
+        ''' Parse the subtree of the element with this ID (in another streaming pass)
+
+        Only the requested element and its descendants are kept in memory and parsing stops
+        as soon as the element ends.
+
+        :returns: A detached element, or None if there is no element with this ID
+        '''
+        _parents = []
+        _target = None
+        for event, elem in _iterparse(self.filepath):
+            if event == 'start':
+                if _target is None and elem.get('id') == id:
+                    _target = elem
+                _parents.append(elem)
+                continue
+            _parents.pop()
+            if elem is _target:
+                if _parents:
+                    del _parents[-1][-1]
+                return elem
+            if _target is None and _parents:
+                del _parents[-1][-1]
+        return None
+
+    def layer(self, name):
+        ''' Parse one layer (by name or ID) into a :class:`ReadOnlyGroup`, or None if not found '''
+        entry = self.find(name, layer_only=True) or self.__layer_by_id(name)
+        if entry is None:
+            return None
+        elem = self.element(entry.ID)
+        return ReadOnlyGroup(elem, None) if elem is not None else None
+
+    def __layer_by_id(self, id):
+        entry = self.__by_id.get(id)
+        return entry if entry is not None and entry.is_layer else None
+
+    def getText(self, id):
+        ''' Get the text lines of a flowRoot or text element by ID (see :meth:`Canvas.getText`) '''
+        if id not in self.__by_id:
+            return []
+        return _text_lines(self.element(id))
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+Compiled templates: fill placeholders without searching the document
+
+Latest version can be found at https://github.com/letuananh/pyinkscape
+
+@author: Le Tuan Anh <tuananh.ke@gmail.com>
+@license: MIT
+'''
+
+# Copyright (c) 2017, Le Tuan Anh <tuananh.ke@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+########################################################################
+
+import re
+import logging
+
+from .inkscape import Canvas
+from .inkscape import _text_lines, _css, _copy_tree
+
+PLACEHOLDER_PATTERN = re.compile(r'\{([A-Za-z_][\w.-]*)\}')
+_SKIPPED_TAGS = ('style', 'script')
+
+
+def getLogger():
+    return logging.getLogger(__name__)
+
+
+# ------------------------------------------------------------------------------
+# Placeholders
+# ------------------------------------------------------------------------------
+
+class Placeholder:
+
+    ''' Location of a value in a template, found by element ID or Inkscape label '''
+
+    def __init__(self, id=None, label=None):
+        if (id is None) == (label is None):
+            raise ValueError("A placeholder needs either an id or a label")
+        self.id = id
+        self.label = label
+
+    def find(self, canvas):
+        ''' Find the target elements in a canvas '''
+        if self.id is not None:
+            elem = canvas.element_by_id(self.id)
+            return [elem] if elem is not None else []
+        return canvas.elements_by_label(self.label)
+
+    def __repr__(self):
+        _key = f"id={self.id!r}" if self.id is not None else f"label={self.label!r}"
+        return f"{type(self).__name__}({_key})"
+
+
+class Text(Placeholder):
+
+    ''' The content of a text, flowRoot, tspan or flowPara element
+
+    Values are written into the first line (tspan/flowPara) of text and flowRoot elements.
+    A list of strings fills consecutive lines, and unused lines are emptied.
+    '''
+
+
+class Attribute(Placeholder):
+
+    ''' An XML attribute of an element, values that are None remove the attribute '''
+
+    def __init__(self, attribute, id=None, label=None):
+        super().__init__(id=id, label=label)
+        self.attribute = attribute
+
+
+class Visibility(Placeholder):
+
+    ''' Show (truthy values) or hide (falsy values) an element, usually a group or a layer '''
+
+
+def _parse_style(style):
+    items = []
+    for item in (style or '').split(';'):
+        k, sep, v = item.partition(':')
+        if sep and k.strip() != 'display':
+            items.append((k.strip(), v.strip()))
+    return items
+
+
+def _walk(elem, path):
+    ''' Iterate over (element, child-index path) pairs of a subtree '''
+    yield elem, path
+    for idx, child in enumerate(elem):
+        yield from _walk(child, path + (idx,))
+
+
+def _path_of(canvas, elem):
+    ''' Child indices from the root element to an element '''
+    path = []
+    parent = canvas._parent_of(elem)
+    while parent is not None:
+        path.append(list(parent).index(elem))
+        elem, parent = parent, canvas._parent_of(parent)
+    return tuple(reversed(path))
+
+
+# ------------------------------------------------------------------------------
+# Compiled templates
+# ------------------------------------------------------------------------------
+
+class CompiledTemplate:
+
+    ''' A template whose placeholder locations are resolved once
+
+    Placeholders are either declared explicitly (by ID or label, see :class:`Text`,
+    :class:`Attribute` and :class:`Visibility`) or found automatically in text contents
+    written as `{field}` (e.g. "Dear {name},"). Filling a record deep-copies the template tree
+    and walks straight to each target through its stored child-index path.
+
+    >>> tpl = CompiledTemplate("certificate.svg", {'photo': Attribute('{http://www.w3.org/1999/xlink}href', id='photo'),
+    ...                                            'honors': Visibility(label='Honors')})
+    >>> for idx, person in enumerate(people):
+    ...     tpl.render(person, f"certificate_{idx}.svg")
+    '''
+
+    def __init__(self, template, placeholders=None, discover=True, **kwargs):
+        '''
+        :param template: Path to an SVG file or a :class:`Canvas`
+        :param placeholders: A dictionary of field name -> :class:`Placeholder`
+        :param discover: Also find `{field}` placeholders in text contents
+        :param kwargs: Options for loading the template (see :class:`Canvas`)
+        '''
+        if isinstance(template, Canvas):
+            canvas = template
+            canvas.reindex()  # placeholder paths need an up-to-date parent map
+            self.filepath = Canvas.FILEPATH_MEMORY
+        else:
+            canvas = Canvas(template, **kwargs)
+            self.filepath = template
+        self.__tree = canvas._copy_tree()
+        self.__text_slots = []  # (field, [path of each line]) for explicit text placeholders
+        self.__format_slots = []  # (path, [literal, field, literal, ...]) for {field} placeholders
+        self.__attribute_slots = []  # (path, field, attribute)
+        self.__visibility_slots = []  # (path, field, style items without display)
+        self.fields = set()
+        for field, placeholder in (placeholders or {}).items():
+            self.__compile(canvas, field, placeholder)
+        if discover:
+            self.__discover()
+
+    def __compile(self, canvas, field, placeholder):
+        elems = placeholder.find(canvas)
+        if not elems:
+            raise KeyError(f"Placeholder {field} not found: {placeholder}")
+        self.fields.add(field)
+        for elem in elems:
+            if isinstance(placeholder, Text):
+                lines = _text_lines(elem) or [elem]
+                self.__text_slots.append((field, [_path_of(canvas, e) for e in lines]))
+            elif isinstance(placeholder, Attribute):
+                self.__attribute_slots.append((_path_of(canvas, elem), field, placeholder.attribute))
+            elif isinstance(placeholder, Visibility):
+                self.__visibility_slots.append((_path_of(canvas, elem), field, _parse_style(elem.get('style'))))
+            else:
+                raise TypeError(f"Unknown placeholder type: {type(placeholder)}")
+
+    def __discover(self):
+        # texts bound to explicit placeholders are not formatted
+        _bound = {path for _, paths in self.__text_slots for path in paths}
+        for elem, path in _walk(self.__tree.getroot(), ()):
+            if not isinstance(elem.tag, str) or elem.tag.rsplit('}', 1)[-1] in _SKIPPED_TAGS or path in _bound:
+                continue
+            if elem.text and '{' in elem.text:
+                parts = PLACEHOLDER_PATTERN.split(elem.text)
+                if len(parts) > 1:
+                    self.__format_slots.append((path, parts))
+                    self.fields.update(parts[1::2])
+
+    def __resolve(self, root, path):
+        elem = root
+        for idx in path:
+            elem = elem[idx]
+        return elem
+
+    def fill(self, values, **kwargs):
+        ''' Create a new :class:`Canvas` from this template with the values of one record
+
+        Fields that are missing in `values` keep their template content.
+
+        :param values: A dictionary of field name -> value
+        :param kwargs: Canvas options (e.g. `id_allocator`)
+        '''
+        tree = _copy_tree(self.__tree)
+        root = tree.getroot()
+        for field, paths in self.__text_slots:
+            if field not in values:
+                continue
+            value = values[field]
+            if isinstance(value, (list, tuple)):
+                for idx, path in enumerate(paths):
+                    self.__resolve(root, path).text = str(value[idx]) if idx < len(value) else ''
+            else:
+                self.__resolve(root, paths[0]).text = str(value)
+        for path, parts in self.__format_slots:
+            self.__resolve(root, path).text = ''.join(
+                part if idx % 2 == 0 else (str(values[part]) if part in values else f"{{{part}}}")
+                for idx, part in enumerate(parts))
+        for path, field, attribute in self.__attribute_slots:
+            if field not in values:
+                continue
+            elem = self.__resolve(root, path)
+            if values[field] is None:
+                elem.attrib.pop(attribute, None)
+            else:
+                elem.set(attribute, str(values[field]))
+        for path, field, style in self.__visibility_slots:
+            if field in values:
+                self.__resolve(root, path).set('style', _css(style + [('display', 'inline' if values[field] else 'none')]))
+        return Canvas._from_tree(tree, filepath=self.filepath, **kwargs)
+
+    def render(self, values, outpath, overwrite=False, encoding="utf-8", **kwargs):
+        ''' Fill a record and write it to an SVG file (see :meth:`Canvas.render`) '''
+        self.fill(values).render(outpath, overwrite=overwrite, encoding=encoding, **kwargs)
@@ -47,7 +47,7 @@ setup(
     tests_require=[],
     install_requires=[],
     extras_require={
-        'dev': ['chirptext', 'lxml']
+        'dev': ['lxml']
     },
     author_email=pkg_info['__email__'],
     description=pkg_info['__description__'],
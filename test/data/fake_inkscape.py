@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+A stand-in for the Inkscape binary, used for testing pyinkscape.render without Inkscape.
+
+It understands the command line export (`fake_inkscape.py file.svg --export-filename=file.pdf`)
+and the `--shell` protocol (`file-open`, `export-filename`, `export-do`, `file-close`, `quit`).
+An "export" copies the SVG content into the output file after a small header.
+Files with "crash" in their names make the process exit abnormally
+and files with "slow" in their names take 10 seconds to export.
+
+:copyright: (c) 2021 Le Tuan Anh <tuananh.ke@gmail.com>
+:license: MIT, see LICENSE for more details.
+'''
+
+import sys
+import time
+from pathlib import Path
+
+PROMPT = "> "
+VERSION = "Inkscape 1.0.1 (fake)"
+
+
+def export(source, target):
+    if "crash" in Path(source).name:
+        sys.exit(3)
+    if "slow" in Path(source).name:
+        time.sleep(10)
+    with open(source, 'rb') as infile, open(target, 'wb') as outfile:
+        outfile.write(f"%FAKE-{Path(target).suffix[1:].upper()}\n".encode('utf-8'))
+        outfile.write(infile.read())
+
+
+def run_shell():
+    sys.stdout.write("Inkscape interactive shell mode. Type 'quit' to quit.\n" + PROMPT)
+    sys.stdout.flush()
+    state = {}
+    for line in sys.stdin:
+        for action in line.split(';'):
+            name, _, arg = action.strip().partition(':')
+            if name == 'quit':
+                return
+            elif name == 'file-open':
+                state['source'] = arg
+            elif name == 'export-filename':
+                state['target'] = arg
+            elif name == 'export-do':
+                export(state['source'], state['target'])
+            elif name == 'file-close':
+                state.pop('source', None)
+        sys.stdout.write(PROMPT)
+        sys.stdout.flush()
+
+
+def run_cli(args):
+    if '--version' in args:
+        print(VERSION)
+        return 0
+    sources = [a for a in args if not a.startswith('--')]
+    targets = [a.split('=', 1)[1] for a in args if a.startswith('--export-filename=')]
+    if not sources or not targets:
+        return 1
+    export(sources[0], targets[0])
+    return 0
+
+
+if __name__ == "__main__":
+    if '--shell' in sys.argv[1:]:
+        run_shell()
+    else:
+        sys.exit(run_cli(sys.argv[1:]))
@@ -9,12 +9,33 @@ Latest version can be found at https://github.com/letuananh/pyinkscape
 :license: MIT, see LICENSE for more details.
 '''
 
+import io
 import os
+import copy
+import gzip
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
 import logging
 import warnings
 from pathlib import Path
-from pyinkscape import Canvas
+from pyinkscape import Canvas, Point, Style, FrozenStyle, DEFAULT_LINESTYLE
+from pyinkscape.inkscape import etree as ET
+from pyinkscape.inkscape import TemplateCache, TEMPLATE_CACHE
+from pyinkscape.inkscape import IDAllocator, SequentialIDAllocator, BBox, INKSCAPE_LABEL
+from pyinkscape.inkscape import Circle, Dimension
+from pyinkscape.geometry import PointArray, _NUMPY_AVAILABLE
+from pyinkscape.charts import PieChart, pie_slice_paths
+from pyinkscape.charts import LineChart, BarChart, ScatterChart, decimate_minmax, decimate_lttb
+from pyinkscape.pathdata import PathBuilder, format_number
+from pyinkscape import instrument
+from pyinkscape.scan import SVGScan
+from pyinkscape.compose import LayerWriter
+from pyinkscape.template import CompiledTemplate, Text, Attribute, Visibility
 
 
 # -------------------------------------------------------------------------------
@@ -33,6 +54,30 @@ def getLogger():
 # Test cases
 # ------------------------------------------------------------------------------
 
+class TestImport(unittest.TestCase):
+
+    HEAVY_MODULES = ('lxml', 'numpy', 'PyPDF2', 'chirptext', 'pyinkscape.inkscape', 'pyinkscape.render')
+
+    def loaded_modules(self, statement):
+        ''' Run an import statement in a fresh interpreter, return the heavy modules it loaded and the files it created '''
+        code = f"import sys\n{statement}\nprint(' '.join(m for m in {self.HEAVY_MODULES!r} if m in sys.modules))"
+        env = dict(os.environ, PYTHONPATH=str(TEST_DIR.parent))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = subprocess.run([sys.executable, '-c', code], cwd=tmpdir, env=env,
+                                    stdout=subprocess.PIPE, check=True, universal_newlines=True)
+            return output.stdout.split(), os.listdir(tmpdir)
+
+    def test_import_is_lazy(self):
+        self.assertEqual(self.loaded_modules("import pyinkscape"), ([], []))
+        modules, files = self.loaded_modules("from pyinkscape import Canvas, PieChart; Canvas()")
+        self.assertEqual(files, [])  # no logging setup at import time
+        self.assertIn('pyinkscape.inkscape', modules)
+        self.assertNotIn('numpy', modules)
+        self.assertNotIn('pyinkscape.render', modules)
+        modules, files = self.loaded_modules("import pyinkscape.render")
+        self.assertNotIn('PyPDF2', modules)
+
+
 class TestTemplate(unittest.TestCase):
 
     def test_load_inkscape_file(self):
@@ -69,6 +114,444 @@ class TestTemplate(unittest.TestCase):
         self.assertIn('sodipodi:docname="new.svg"', str(t))
 
 
+class TestTemplateCache(unittest.TestCase):
+
+    def test_canvas_reuses_parsed_template(self):
+        TEMPLATE_CACHE.clear()
+        c1 = Canvas(TEST_CANVAS)
+        c2 = Canvas(TEST_CANVAS)
+        self.assertEqual((TEMPLATE_CACHE.hits, TEMPLATE_CACHE.misses), (1, 1))
+        # each canvas owns a private copy of the tree
+        c1.layers()[0].text("only in c1", (10, 10))
+        self.assertIn("only in c1", str(c1))
+        self.assertNotIn("only in c1", str(c2))
+        Canvas(TEST_CANVAS, use_cache=False)
+        self.assertEqual((TEMPLATE_CACHE.hits, TEMPLATE_CACHE.misses), (1, 1))
+
+    def test_cache_invalidation_and_eviction(self):
+        cache = TemplateCache(maxsize=1)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            svg_path = os.path.join(tmpdir, 'template.svg')
+            shutil.copy(TEST_GRAPHIC, svg_path)
+            cache.get(svg_path)
+            cache.get(svg_path)
+            self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 1})
+            # modified files are parsed again
+            with open(svg_path, 'a') as outfile:
+                outfile.write('\n')
+            cache.get(svg_path)
+            self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 2, 1))
+            # least recently used templates are evicted
+            cache.get(TEST_CANVAS)
+            cache.get(svg_path)
+            self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 4, 1))
+
+    def test_cache_size_limits(self):
+        _size = os.path.getsize(TEST_GRAPHIC)
+        cache = TemplateCache(max_file_size=_size - 1)
+        cache.get(TEST_GRAPHIC)
+        cache.get(TEST_GRAPHIC)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 2, 0))
+        # the total size of the cached files is bounded
+        cache = TemplateCache(max_bytes=_size + os.path.getsize(TEST_CANVAS) - 1)
+        cache.get(TEST_GRAPHIC)
+        cache.get(TEST_CANVAS)
+        self.assertEqual(len(cache), 1)
+        cache.get(TEST_CANVAS)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+
+class TestCanvasCopy(unittest.TestCase):
+
+    def test_copy(self):
+        base = Canvas(TEST_CANVAS)
+        base.layers()[0].text("in base", (10, 10), id='base_text')
+        fork = base.fork(id_allocator=SequentialIDAllocator())
+        self.assertEqual(str(fork), str(base))
+        self.assertEqual((fork.units, fork.width, fork.height, fork.scale), (base.units, base.width, base.height, base.scale))
+        self.assertEqual(fork.viewBox.to_tuple(), base.viewBox.to_tuple())
+        self.assertIsNot(fork.viewBox, base.viewBox)
+        # the copy has its own tree and indexes
+        self.assertIsNot(fork.element_by_id('base_text'), base.element_by_id('base_text'))
+        fork.layers()[0].text("only in fork", (10, 10), id='fork_text')
+        self.assertEqual(fork.element_by_id('fork_text').text, "only in fork")
+        self.assertIsNone(base.element_by_id('fork_text'))
+        fork.group('Layer 1').delete()
+        self.assertIsNotNone(base.group('Layer 1'))
+        self.assertEqual(copy.deepcopy(base).to_xml_string(), base.to_xml_string())
+
+
+class TestIDAllocation(unittest.TestCase):
+
+    def test_block_allocator_is_unique_across_threads(self):
+        allocator = IDAllocator(block_size=16)
+        results = []
+
+        def _work():
+            results.append([next(allocator) for _ in range(50)] + allocator.take(100))
+        threads = [threading.Thread(target=_work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        _all = [x for ids in results for x in ids]
+        self.assertEqual(len(_all), 8 * 150)
+        self.assertEqual(len(set(_all)), len(_all))
+
+    def test_deterministic_canvas_ids(self):
+        def _draw():
+            c = Canvas(id_allocator=SequentialIDAllocator())
+            l = c.layers()[0]
+            l.circle((0, 0), 1)
+            l.circles([(1, 1), (2, 2)], 1)
+            l.text("Hello", (5, 5))
+            return str(c)
+        self.assertEqual(_draw(), _draw())
+        self.assertIn('id="__pyinkscape_circle_3"', _draw())
+
+    def test_check_ids(self):
+        c = Canvas(id_allocator=SequentialIDAllocator(), check_ids=True)
+        l = c.layers()[0]
+        l.circle((0, 0), 1, id='__pyinkscape_circle_2')
+        ids = [e.get('id') for e in l.circles([(1, 1), (2, 2)], 1)]
+        self.assertEqual(ids, ['__pyinkscape_circle_1', '__pyinkscape_circle_3'])
+        self.assertEqual(l.circle((0, 0), 1).ID, '__pyinkscape_circle_4')
+
+
+class TestStyle(unittest.TestCase):
+
+    def test_style(self):
+        s = Style(fill='#FF0000', stroke_width='1px')
+        self.assertEqual(str(s), 'fill:#FF0000;stroke-width:1px')
+        s2 = s.clone(fill='none')
+        self.assertEqual(str(s2), 'fill:none;stroke-width:1px')
+        self.assertEqual(str(s), 'fill:#FF0000;stroke-width:1px')
+
+    def test_frozen_style(self):
+        s = FrozenStyle(fill='#FF0000', stroke_width='1px')
+        self.assertEqual(str(s), 'fill:#FF0000;stroke-width:1px')
+        self.assertIs(s, Style(fill='#FF0000', stroke_width='1px').freeze())
+        with self.assertRaises(TypeError):
+            s.attributes['fill'] = 'none'
+        # cloning keeps the property order of Style.clone()
+        self.assertEqual(str(s.clone(fill='none')), str(s.thaw().clone(fill='none')))
+        self.assertEqual(str(s.clone(opacity='0.5')), 'fill:#FF0000;stroke-width:1px;opacity:0.5')
+        self.assertIs(s.clone(opacity='0.5'), FrozenStyle(fill='#FF0000', stroke_width='1px', opacity='0.5'))
+        self.assertIs(pickle.loads(pickle.dumps(DEFAULT_LINESTYLE)), DEFAULT_LINESTYLE)
+
+    def test_frozen_style_value_types(self):
+        self.assertEqual(str(FrozenStyle(opacity=True)), 'opacity:True')
+        self.assertEqual(str(FrozenStyle(opacity=1)), 'opacity:1')
+        self.assertEqual(str(FrozenStyle(stroke_width=1.0)), 'stroke-width:1.0')
+        self.assertEqual(str(FrozenStyle(stroke_width=1)), 'stroke-width:1')
+        self.assertEqual(str(FrozenStyle(fill='none').clone(opacity=1.0)), 'fill:none;opacity:1.0')
+        self.assertEqual(str(FrozenStyle(fill='none').clone(opacity=1)), 'fill:none;opacity:1')
+        self.assertIs(FrozenStyle(stroke_width=1), FrozenStyle(stroke_width=1))
+
+    def test_frozen_style_unhashable(self):
+        s = FrozenStyle(fill='none', stroke_dasharray=[1, 2])
+        self.assertEqual(str(s), 'fill:none;stroke-dasharray:[1, 2]')
+        self.assertEqual(dict(s.attributes), {'fill': 'none', 'stroke_dasharray': [1, 2]})
+        self.assertEqual(str(s.clone(opacity=1)), 'fill:none;stroke-dasharray:[1, 2];opacity:1')
+        self.assertEqual(str(s.clone(fill='red')), 'fill:red;stroke-dasharray:[1, 2]')
+
+
+class TestGeometry(unittest.TestCase):
+
+    def test_value_types(self):
+        p = Point(1, 2)
+        self.assertFalse(hasattr(p, '__dict__'))
+        self.assertEqual(Point(4, 6) / 2, Point(2, 3))
+        b = BBox(1, 2, 10, 20)
+        self.assertEqual((b.x1, b.y1, b.x2, b.y2, b.to_tuple()), (1, 2, 11, 22, (1, 2, 10, 20)))
+        self.assertFalse(hasattr(b, '__dict__'))
+
+    def test_point_array(self):
+        points = [(0, 0), (10, 0), Point(10, 10), (3, 7)]
+        backends = [False, True] if _NUMPY_AVAILABLE else [False]
+        for use_numpy in backends:
+            pts = PointArray.from_points(points, use_numpy=use_numpy)
+            self.assertEqual(len(pts), 4)
+            rotated = pts.rotate(30, center=(5, 5))
+            for p, r in zip(points, rotated):
+                expected = Point.rotate(p, (5, 5), 30)
+                self.assertAlmostEqual(r.x, expected.x)
+                self.assertAlmostEqual(r.y, expected.y)
+            self.assertEqual(pts.translate(1, 2)[3], Point(4, 9))
+            self.assertEqual(pts.scale(2, center=(10, 10)).tolist()[:2], [(-10, -10), (10, -10)])
+            self.assertEqual(pts.bbox().to_tuple(), (0, 0, 10, 10))
+            self.assertIsNone(PointArray([], [], use_numpy=use_numpy).bbox())
+            # point arrays can be drawn in bulk
+            c = Canvas()
+            circles = c.layers()[0].circles(pts, 1)
+            self.assertEqual([e.get('cy') for e in circles], ['0.0', '0.0', '10.0', '7.0'])
+
+
+class TestPathData(unittest.TestCase):
+
+    def test_format_number(self):
+        self.assertEqual([format_number(x) for x in (0.5, -0.25, 12.3456, 3.0, -0.001, 100)],
+                         ['.5', '-.25', '12.35', '3', '0', '100'])
+        self.assertEqual(format_number(123.45678901234567, precision=0), '123')
+
+    def test_path_builder(self):
+        p = PathBuilder().lines([0, 50, 100, 100.5, 0], [50, 0, 50, 50, 0])
+        self.assertEqual(str(p), 'M0 50 50 0l50 50h.5L0 0')
+        self.assertEqual(len(p), len(str(p)))
+        p = PathBuilder(relative=True).move_to(1, 1).line_to(2, 3).move_to(5, 5).line_to(6, 6).line_to(7, 8).close()
+        self.assertEqual(str(p), 'M1 1l1 2m3 2 1 1 1 2z')
+        self.assertEqual(p.current_point, (5, 5))
+        p = PathBuilder(relative=False).move_to(1, 1).arc_to(5, 5, 0, False, True, -3.25, -0.5).curve_to(1, 2, 3, 4, 5, 6)
+        self.assertEqual(str(p), 'M1 1A5 5 0 0 1-3.25-.5C1 2 3 4 5 6')
+        # builders can be drawn directly
+        c = Canvas()
+        self.assertEqual(c.layers()[0].path(p).elem.get('d'), str(p))
+
+    def test_compact_pie(self):
+        slices = pie_slice_paths((200, 200), (150, 150), [23, 77], precision=2)
+        self.assertEqual(slices[0][2], 'M200 50A150 150 0 0 1 348.82 181.2L200 200z')
+
+
+class TestCharts(unittest.TestCase):
+
+    def test_pie_slices(self):
+        percents = [23, 2, 12, 43, 9, 11]
+        slices = pie_slice_paths((200, 200), (150, 150), percents)
+        # boundaries match rotating the starting point around the center
+        total = 0
+        for percent, (start, target, path) in zip(percents, slices):
+            total += percent
+            expected = Point.rotate_percent((200, 50), (200, 200), total)
+            self.assertAlmostEqual(target.x, expected.x)
+            self.assertAlmostEqual(target.y, expected.y)
+        self.assertEqual(slices[0][2], "M 200 50 A 150 150, 0, 0, 1, 348.8172051971717 181.20001496535437 L 200 200 Z")
+        # a complete pie ends exactly at its starting point, even with thousands of slices
+        self.assertEqual(pie_slice_paths((0, 0), (1, 1), [0.05] * 2000)[-1][1], Point(0, -1))
+
+    def test_render_pie_chart(self):
+        c = Canvas()
+        l = c.layers()[0]
+        pie = PieChart(l, center=(200, 200), radius=(150, 150))
+        self.assertEqual(len(pie.slide(50, 0, 30, 20)), 3)
+        pie.render()
+        paths = [e for e in l.elem if e.get('id', '').startswith('piechart_slide')]
+        self.assertEqual(len(paths), 3)
+        self.assertEqual([s.start for s in pie.slides[1:]], [s.target for s in pie.slides[:-1]])
+        self.assertIn('fill:#E69F00', paths[1].get('style'))
+
+    def test_decimation(self):
+        xs = list(range(10000))
+        ys = [(x % 97) - (500 if x == 5003 else 0) for x in xs]
+        dx, dy = decimate_minmax(xs, ys, 100)
+        self.assertLessEqual(len(dx), 400)
+        self.assertEqual((min(dy), max(dy)), (min(ys), max(ys)))  # spikes are kept
+        self.assertEqual(dx, sorted(dx))
+        lx, ly = decimate_lttb(xs, ys, 100)
+        self.assertEqual(len(lx), 100)
+        self.assertEqual((lx[0], lx[-1]), (0, 9999))
+        self.assertIn(5003, lx)
+        # short series are not changed
+        self.assertEqual(decimate_lttb([1, 2, 3], [4, 5, 6], 100), ([1, 2, 3], [4, 5, 6]))
+
+    def test_xy_charts(self):
+        c = Canvas()
+        l = c.layers()[0]
+        ys = [x % 10 for x in range(100000)]
+        line = LineChart(l, (0, 0, 100, 50), ys, decimate='lttb')
+        path = line.render()
+        self.assertTrue(path.elem.get('d').startswith('M0 50'))
+        self.assertLessEqual(path.elem.get('d').count('l') + path.elem.get('d').count('L'), 99)
+        full = LineChart(l, (0, 0, 100, 50), [0, 5, 10], [0, 10, 0]).path_data()
+        self.assertEqual(full, "M0 50 50 0l50 50")
+        dots = ScatterChart(l, (0, 0, 10, 10), range(1000), range(1000), decimate=True).render()
+        self.assertLess(len(dots), 25)  # at most a few points per 1x1 cell along the diagonal
+        bars = BarChart(l, (0, 0, 100, 100), [1, -1, 2], gap=0).render()
+        for e, (y, height) in zip(bars, [(100 / 3, 100 / 3), (200 / 3, 100 / 3), (0, 200 / 3)]):
+            self.assertAlmostEqual(float(e.get('y')), y)
+            self.assertAlmostEqual(float(e.get('height')), height)
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_profile(self):
+        self.assertFalse(instrument.enabled)
+        with instrument.profile() as stats:
+            self.assertTrue(instrument.enabled)
+            c = Canvas(TEST_CANVAS, use_cache=False)
+            c.groups()
+            l = c.layer('Layer 1')
+            l.circle((0, 0), 5)
+            l.circles([(1, 1), (2, 2)], 1)
+            l.text("Hello", (10, 10))
+            xml = c.to_xml_string()
+            buf = io.BytesIO()
+            c.write(buf)
+        self.assertFalse(instrument.enabled)
+        self.assertEqual(stats['canvas.load'].calls, 1)
+        self.assertGreater(stats['canvas.load'].total, 0)
+        self.assertIn('canvas.xpath', stats)
+        self.assertEqual(stats['element.circle'].count, 3)
+        self.assertEqual(stats['element.text'].count, 1)
+        self.assertEqual(stats['canvas.serialize'].calls, 2)
+        self.assertEqual(stats['canvas.serialize'].nbytes, len(xml.encode('utf-8')) + len(buf.getvalue()))
+        self.assertIn('canvas.load', stats.summary())
+
+    def test_sinks(self):
+        events = []
+        instrument.add_sink(events.append)
+        try:
+            Canvas()
+            # profiles only see events of their own thread
+            with instrument.profile() as stats:
+                t = threading.Thread(target=Canvas)
+                t.start()
+                t.join()
+        finally:
+            instrument.remove_sink(events.append)
+        self.assertFalse(instrument.enabled)
+        self.assertEqual([e.name for e in events], ['canvas.load', 'canvas.load'])
+        self.assertNotIn('canvas.load', stats)
+        Canvas()
+        self.assertEqual(len(events), 2)
+
+
+class TestScan(unittest.TestCase):
+
+    def test_scan_index(self):
+        c = Canvas(TEST_GRAPHIC)
+        scan = SVGScan(TEST_GRAPHIC)
+        self.assertEqual([(g.ID, g.label) for g in scan.groups()], [(g.ID, g.label) for g in c.groups()])
+        self.assertEqual([l.ID for l in scan.layers()], [l.ID for l in c.layers()])
+        self.assertEqual(scan.find('Layer 1').ID, 'layerManual')
+        self.assertIsNone(scan.find('no such group'))
+
+    def test_load_one_layer(self):
+        c = Canvas(TEST_GRAPHIC)
+        c.layer('Layer 1').text("Hello", (10, 10), id='hello')
+        c.layer('Layer 2').text("World", (10, 10), id='world')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            svg_path = os.path.join(tmpdir, 'texts.svg')
+            c.render(svg_path)
+            scan = SVGScan(svg_path)
+            self.assertEqual([t.ID for t in scan.texts()], ['world', 'hello'])
+            self.assertEqual([t.ID for t in scan.texts(layer='Layer 1')], ['hello'])
+            layer = scan.layer('Layer 2')
+            self.assertEqual(layer.ID, 'layer2')
+            self.assertIsNone(layer.parent_elem)
+            for _modify in (layer.delete, lambda: layer.text("x", (0, 0)), lambda: layer.circles([(0, 0)], 1)):
+                with self.assertRaisesRegex(TypeError, 'read-only'):
+                    _modify()
+            self.assertEqual(len(list(layer.elem.iter())), len(list(c.layer('Layer 2').elem.iter())))
+            self.assertEqual([e.get('id') for e in layer.elem.iter() if e.get('id') == 'hello'], [])
+            self.assertEqual(scan.layer('layerManual').label, 'Layer 1')
+            hello = scan.element('hello')
+            self.assertEqual(hello.text, "Hello")
+            self.assertEqual(dict(hello.attrib), dict(c.element_by_id('hello').attrib))
+            self.assertEqual(scan.getText('hello'), [])  # drawn texts have no tspan lines
+            self.assertIsNone(scan.layer('no such layer'))
+
+
+class TestLayerWriter(unittest.TestCase):
+
+    def test_stream_layers(self):
+        c = Canvas(TEST_GRAPHIC)
+        layer_count = len(c.layers())
+        with tempfile.TemporaryDirectory() as tmpdir:
+            svg_path = os.path.join(tmpdir, 'composed.svg')
+            with LayerWriter(svg_path, c) as writer:
+                for idx in range(3):
+                    layer = writer.new_layer(f"Generated {idx}")
+                    layer.circle((idx, idx), 2)
+                    layer.text(f"Text {idx}", (idx, idx), id=f"text{idx}")
+                    writer.write(layer)
+                    self.assertIsNone(c.layer(f"Generated {idx}"))  # already written and freed
+            self.assertEqual(writer.written, 3)
+            self.assertTrue(writer.closed)
+            self.assertEqual(len(c.layers()), layer_count)
+            composed = Canvas(svg_path, use_cache=False)
+        self.assertEqual([l.label for l in composed.layers()],
+                         ['Layer 2', 'Layer 1', 'Generated 0', 'Generated 1', 'Generated 2'])
+        self.assertEqual(composed.element_by_id('text2').text, "Text 2")
+        self.assertIsNotNone(composed.group('Layer 1'))
+
+    def test_stream_into_group(self):
+        c = Canvas(TEST_GRAPHIC)
+        buf = io.BytesIO()
+        with LayerWriter(buf, c, parent=c.layer('Layer 1')) as writer:
+            sublayer = writer.new_layer("Sublayer", id='sublayer')
+            sublayer.rect((0, 0), (10, 10))
+            writer.write(sublayer)
+        self.assertFalse(buf.closed)
+        root = ET.fromstring(buf.getvalue())
+        layer1 = root.find(".//{http://www.w3.org/2000/svg}g[@id='layerManual']")
+        self.assertEqual(layer1[-1].get('id'), 'sublayer')
+        self.assertEqual(len(layer1), len(c.layer('Layer 1').elem) + 1)
+
+    def test_new_layer_before_open(self):
+        buf = io.BytesIO()
+        writer = LayerWriter(buf)
+        layer = writer.new_layer("Pending", id='dup')
+        layer.circle((0, 0), 1)
+        writer.write(layer)
+        writer.close()
+        self.assertEqual(buf.getvalue().count(b'id="dup"'), 1)
+        self.assertEqual(ET.fromstring(buf.getvalue()).findall(".//*[@id='dup']")[0].get('id'), 'dup')
+
+
+class TestCompiledTemplate(unittest.TestCase):
+
+    def make_template(self):
+        c = Canvas(TEST_GRAPHIC)
+        l = c.layer('Layer 1')
+        l.text("Dear {name}, welcome to {org}!", (10, 10), id='greeting')
+        address = l.text("", (10, 50), id='address')
+        for line in ("line 1", "line 2"):
+            ET.SubElement(address.elem, '{http://www.w3.org/2000/svg}tspan').text = line
+        l.circle((0, 0), 5, id='badge')
+        return c
+
+    def test_fill(self):
+        c = self.make_template()
+        tpl = CompiledTemplate(c, {'address': Text(id='address'), 'color': Attribute('fill', id='badge'),
+                                   'extra': Visibility(label='Layer 2')})
+        self.assertEqual(tpl.fields, {'name', 'org', 'address', 'color', 'extra'})
+        filled = tpl.fill({'name': 'Alice', 'address': ['1 Main St'], 'color': 'gold', 'extra': False})
+        self.assertEqual(filled.element_by_id('greeting').text, "Dear Alice, welcome to {org}!")
+        self.assertEqual([e.text for e in filled.getText('address')], ['1 Main St', ''])
+        self.assertEqual(filled.element_by_id('badge').get('fill'), 'gold')
+        self.assertIn('display:none', filled.layer('Layer 2').elem.get('style'))
+        filled = tpl.fill({'address': 'PO Box 1', 'color': None, 'extra': True})
+        self.assertEqual([e.text for e in filled.getText('address')], ['PO Box 1', 'line 2'])
+        self.assertIsNone(filled.element_by_id('badge').get('fill'))
+        self.assertIn('display:inline', filled.layer('Layer 2').elem.get('style'))
+        # the template is not modified
+        self.assertEqual(c.element_by_id('greeting').text, "Dear {name}, welcome to {org}!")
+        self.assertEqual(tpl.fill({}).element_by_id('greeting').text, "Dear {name}, welcome to {org}!")
+
+    def test_explicit_text_placeholder(self):
+        c = self.make_template()
+        c.layer('Layer 1').text("{title}", (10, 90), id='headline')
+        tpl = CompiledTemplate(c, {'headline': Text(id='headline')})
+        self.assertNotIn('title', tpl.fields)
+        filled = tpl.fill({'headline': 'Explicit value', 'title': 'Ignored'})
+        self.assertEqual(filled.element_by_id('headline').text, 'Explicit value')
+        self.assertEqual(tpl.fill({}).element_by_id('headline').text, '{title}')
+
+    def test_render_and_errors(self):
+        c = self.make_template()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            svg_path = os.path.join(tmpdir, 'template.svg')
+            c.render(svg_path)
+            tpl = CompiledTemplate(svg_path)
+            output = os.path.join(tmpdir, 'output.svg')
+            tpl.render({'name': 'Bob', 'org': 'ACME'}, output)
+            self.assertEqual(Canvas(output).element_by_id('greeting').text, "Dear Bob, welcome to ACME!")
+            with self.assertRaises(KeyError):
+                CompiledTemplate(svg_path, {'missing': Text(id='no-such-id')})
+        with self.assertRaises(ValueError):
+            Text()
+
+
 class TestSelectingObject(unittest.TestCase):
 
     def test_layer_search(self):
@@ -105,6 +588,121 @@ class TestSelectingObject(unittest.TestCase):
         self.assertIsNotNone(g3a)
         self.assertIsNone(g3a.label)
 
+    def test_index_lookups(self):
+        c = Canvas(TEST_GRAPHIC)
+        self.assertEqual(c.element_by_id('g886').get('id'), 'g886')
+        self.assertEqual([e.get('id') for e in c.elements_by_label('complex shape 1')], ['g837'])
+        self.assertIsNone(c.group_by_id('g886', layer_only=True))
+        self.assertIsNone(c.element_by_id('no-such-id'))
+        # elements created through groups are indexed
+        l2 = c.layer_by_id('layer2')
+        txt = l2.text("Indexed", (10, 10), id='indexed_text')
+        self.assertIs(c.element_by_id('indexed_text'), txt.elem)
+        sub = l2.new('{http://www.w3.org/2000/svg}g', id='subgroup', **{'{http://www.inkscape.org/namespaces/inkscape}label': 'Sub'})
+        self.assertIs(c.element_by_id('subgroup'), sub)
+        self.assertEqual(c.group('Sub').ID, 'subgroup')
+        # deleted groups are removed from the index
+        c.group('Sub').delete()
+        self.assertIsNone(c.group('Sub'))
+        self.assertIsNone(c.element_by_id('subgroup'))
+
+    def test_index_external_mutation(self):
+        c = Canvas(TEST_GRAPHIC)
+        g = c.group_by_id('g841')
+        layer = c.layer('Layer 2')
+        g.elem.set('id', 'renamed')
+        self.assertIsNone(c.group_by_id('g841'))
+        # rebuilding the index after a detected change keeps the group objects
+        self.assertIs(c.layer('Layer 2'), layer)
+        c.reindex()
+        self.assertEqual(c.group_by_id('renamed').elem, g.elem)
+
+    def test_index_external_additions(self):
+        c = Canvas(TEST_GRAPHIC)
+        layer = c.layer('Layer 1')
+        self.assertIsNone(c.group_by_id('added'))
+        elem = ET.SubElement(layer.elem, '{http://www.w3.org/2000/svg}g', {'id': 'added', INKSCAPE_LABEL: 'Added'})
+        # misses do not rebuild the index, elements added directly need an explicit reindex
+        self.assertIsNone(c.group('Added'))
+        c.reindex()
+        self.assertIs(c.element_by_id('added'), elem)
+        self.assertIs(c.group_by_id('added').elem, elem)
+        self.assertIs(c.group('Added').elem, elem)
+        self.assertEqual([e.get('id') for e in c.elements_by_label('Added')], ['added'])
+        self.assertIn('added', [g.ID for g in c.groups()])
+
+    def test_parent_map_external_mutation(self):
+        c = Canvas(TEST_GRAPHIC)
+        layer = c.layer('Layer 1')
+        c.group_by_id('g837').delete()  # builds the parent map on ElementTree
+        elem = ET.SubElement(layer.elem, '{http://www.w3.org/2000/svg}g', {'id': 'added'})
+        g = [x for x in c.groups() if x.ID == 'added'][0]
+        self.assertIs(g.parent_elem, layer.elem)
+        g.delete()
+        self.assertNotIn(elem, list(layer.elem))
+        self.assertIsNone(c.group_by_id('added'))
+
+    def test_external_removal(self):
+        c = Canvas(TEST_GRAPHIC)
+        g = c.group_by_id('g837')
+        self.assertIs(c.group('complex shape 1'), g)
+        c.layer('Layer 1').elem.remove(g.elem)
+        c.reindex()  # ElementTree elements do not know their parents
+        self.assertIsNone(c.group_by_id('g837'))
+        self.assertIsNone(c.group('complex shape 1'))
+        self.assertNotIn('g837', [x.ID for x in c.groups()])
+
+    def test_get_text(self):
+        c = Canvas()
+        t = c.layers()[0].text("Hello", (10, 10), id='greeting')
+        self.assertEqual(c.getText('greeting'), [])
+        tspan = ET.SubElement(t.elem, '{http://www.w3.org/2000/svg}tspan')
+        tspan.text = 'World'
+        self.assertEqual([x.text for x in c.getText('greeting')], ['World'])
+        self.assertEqual(c.getText('missing'), [])
+
+
+class TestQuery(unittest.TestCase):
+
+    def test_find(self):
+        c = Canvas(TEST_GRAPHIC)
+        self.assertEqual(c.find(id='g855').get('id'), 'g855')
+        self.assertIsNone(c.find(tag='circle', id='g855'))
+        self.assertEqual(c.find(label='complex shape 1').get('id'), 'g837')
+        self.assertEqual(c.find('circle').get('id'), 'path833')
+        self.assertEqual(c.find('{http://www.w3.org/2000/svg}rect').get('id'), 'rect831')
+        self.assertIsNone(c.find('rect', layer='Layer 2'))
+        self.assertIsNone(c.find(id='rect831', layer='layer2'))
+        self.assertIsNone(c.find('path', layer='no such layer'))
+        _paths = [e.get('id') for e in c.iterfind('path', layer=c.layer('Layer 2'))]
+        self.assertEqual(len(_paths), 13)
+        self.assertEqual(_paths[0], 'path853')
+        # a layer is not inside itself
+        self.assertIsNone(c.find(id='layer2', layer='Layer 2'))
+        # newly drawn elements are found too
+        c.layer('Layer 1').text("Hello", (10, 10), id='new_text')
+        self.assertEqual(c.find('text', layer='Layer 1').get('id'), 'new_text')
+        self.assertEqual(c.find('text', id='new_text').get('id'), 'new_text')
+
+    def test_iterfind_is_lazy(self):
+        c = Canvas(TEST_GRAPHIC)
+        found = c.iterfind('path')
+        self.assertEqual(next(found).get('id'), 'path853')
+        self.assertEqual(next(found).get('id'), 'path843')
+
+    def test_group_paths(self):
+        c = Canvas(TEST_GRAPHIC)
+        self.assertEqual(len(c.group_by_id('g841').paths()), 6)
+        self.assertEqual(c.group('Layer 1').paths(), [])
+
+    def test_xpath_variables(self):
+        c = Canvas(TEST_GRAPHIC)
+        for name in ("Layer 2", "complex shape 1"):
+            groups = c.xpath(".//ns:g[@inkscape:label=$name]", name=name)
+            self.assertEqual([g.get(INKSCAPE_LABEL) for g in groups], [name])
+        # values are never parsed as part of the query
+        self.assertEqual(c.xpath(".//ns:g[@inkscape:label=$name]", name="it's"), [])
+
 
 class TestSVGManipulation(unittest.TestCase):
 
@@ -117,11 +715,78 @@ class TestSVGManipulation(unittest.TestCase):
         self.assertIn("__pyinkscape_text_", _xml_code)
         self.assertIn("__pyinkscape_circle_", _xml_code)
 
+    def test_render_to_stream(self):
+        c = Canvas()
+        c.layers()[0].text("Streamed", (50, 50))
+        # render into a binary stream
+        stream = io.BytesIO()
+        c.render(stream)
+        self.assertEqual(stream.getvalue().decode('utf-8'), str(c))
+        # render through a gzip stream
+        compressed = io.BytesIO()
+        with gzip.GzipFile(fileobj=compressed, mode='wb') as gz:
+            c.render(gz)
+        self.assertEqual(gzip.decompress(compressed.getvalue()), stream.getvalue())
+        # render into a file
+        with tempfile.TemporaryDirectory() as tmpdir:
+            svg_path = os.path.join(tmpdir, 'streamed.svg')
+            c.render(svg_path)
+            self.assertEqual(Canvas(svg_path, use_cache=False).docname, c.docname)
+            with open(svg_path, 'rb') as infile:
+                self.assertIn(b'Streamed', infile.read())
+
+    def test_bulk_drawing(self):
+        c = Canvas()
+        l = c.layers()[0]
+        single = l.circle((1, 2), 3, id='single')
+        circles = l.circles([(1, 2), Point(4, 5)], [3, 6])
+        self.assertEqual(len(circles), 2)
+        _attrs = lambda e: {k: v for k, v in e.attrib.items() if k != 'id'}
+        self.assertEqual(_attrs(circles[0]), _attrs(single.elem))
+        self.assertEqual((circles[1].get('cx'), circles[1].get('r')), ('4', '6'))
+        self.assertNotEqual(circles[0].get('id'), circles[1].get('id'))
+        self.assertIs(c.element_by_id(circles[1].get('id')), circles[1])
+        lines = l.lines([((0, 0), (10, 10)), (1, 2, 3, 4)], stroke_dasharray='none')
+        self.assertEqual([(e.get('x1'), e.get('y2'), e.get('stroke_dasharray')) for e in lines],
+                         [('0', '10', 'none'), ('1', '4', 'none')])
+        rects = l.rects([(0, 0), (5, 5), (9, 9)], (2, 3))
+        self.assertEqual([(e.get('x'), e.get('width'), e.get('height')) for e in rects],
+                         [('0', '2', '3'), ('5', '2', '3'), ('9', '2', '3')])
+        with self.assertRaises(ValueError):
+            l.circles([(0, 0), (1, 1)], [1, 2, 3])
+
+    def test_bulk_drawing_return_types(self):
+        l = Canvas().layers()[0]
+        self.assertIsInstance(l.circle((1, 2), 3), Circle)
+        self.assertTrue(all(ET.iselement(e) for e in l.circles([(1, 2)], 3)))
+        # lines and rects are XML elements like the ones returned by line() and rect()
+        self.assertEqual(type(l.lines([(0, 0, 1, 1)])[0]), type(l.line(Point(0, 0), Point(1, 1))))
+        self.assertEqual(type(l.rects([(0, 0)], (1, 1))[0]), type(l.rect(Point(0, 0), Dimension(1, 1))))
+
     def test_remove_group(self):
         c = Canvas()
         l = c.layer('Layer 1')
         o = l.elem.find('..')
 
+    def test_delete_nested_groups(self):
+        c = Canvas(TEST_GRAPHIC)
+        self.assertEqual(len(c.groups()), 6)
+        # groups created after the parent map was built can be deleted
+        l1 = c.layer('Layer 1')
+        outer = c.group_by_id(l1.new('{http://www.w3.org/2000/svg}g', id='outer').get('id'))
+        inner_elem = outer.new('{http://www.w3.org/2000/svg}g', id='inner')
+        inner = c.group_by_id('inner')
+        self.assertIs(inner.parent_elem, outer.elem)
+        inner.delete()
+        self.assertNotIn(inner_elem, list(outer.elem))
+        outer.delete()
+        self.assertNotIn(outer.elem, list(l1.elem))
+        # delete existing groups and layers
+        c.group_by_id('g886').delete()
+        c.layer_by_id('layer2').delete()
+        self.assertEqual({g.ID for g in c.groups()}, {'layerManual', 'g837'})
+        self.assertIsNone(c.group_by_id('g841'))
+
 
 # -------------------------------------------------------------------------------
 # MAIN
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Test script for pyInkscape SVG conversion
+Latest version can be found at https://github.com/letuananh/pyinkscape
+
+:copyright: (c) 2021 Le Tuan Anh <tuananh.ke@gmail.com>
+:license: MIT, see LICENSE for more details.
+'''
+
+import os
+import sys
+import time
+import asyncio
+import shutil
+import tempfile
+import unittest
+import logging
+from pathlib import Path
+from unittest import mock
+from pyinkscape import render, instrument
+from pyinkscape import Canvas
+from pyinkscape.batch import generate_many
+from pyinkscape import aio
+from pyinkscape.cache import ConversionCache
+
+
+# -------------------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------------------
+
+TEST_DIR = Path(os.path.dirname(os.path.realpath(__file__)))
+TEST_GRAPHIC = TEST_DIR / 'data/graphic.svg'
+FAKE_INKSCAPE = [sys.executable, str(TEST_DIR / 'data/fake_inkscape.py')]
+
+
+def getLogger():
+    return logging.getLogger(__name__)
+
+
+def make_svg_files(directory, names):
+    paths = []
+    for name in names:
+        path = Path(directory) / name
+        shutil.copy(TEST_GRAPHIC, path)
+        paths.append(path)
+    return paths
+
+# ------------------------------------------------------------------------------
+# Test cases
+# ------------------------------------------------------------------------------
+
+class TestInkscapeShell(unittest.TestCase):
+
+    def test_svg_to_pdf(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            svg_file, = make_svg_files(tmpdir, ['single.svg'])
+            with instrument.profile() as stats:
+                render.svg_to_pdf(svg_file, inkscape_path=FAKE_INKSCAPE)
+            self.assertTrue(svg_file.with_suffix('.pdf').read_bytes().startswith(b'%FAKE-PDF'))
+            self.assertEqual(stats['inkscape.export'].calls, 1)
+            self.assertGreater(stats['inkscape.export'].total, 0)
+
+    def test_shell_export(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            svg_files = make_svg_files(tmpdir, ['a.svg', 'b.svg'])
+            with render.InkscapeShell(FAKE_INKSCAPE) as shell:
+                for svg_file in svg_files:
+                    result = shell.export(svg_file, svg_file.with_suffix('.png'))
+                    self.assertTrue(result)
+                    self.assertTrue(svg_file.with_suffix('.png').read_bytes().startswith(b'%FAKE-PNG'))
+
+    def test_pool_restarts_crashed_shells(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            svg_files = make_svg_files(tmpdir, ['p1.svg', 'crash.svg', 'p2.svg', 'p3.svg', 'p4.svg'])
+            with render.InkscapePool(workers=2, inkscape_path=FAKE_INKSCAPE) as pool:
+                results = pool.convert(svg_files)
+                self.assertEqual([r.source for r in results], svg_files)
+                self.assertEqual([r.ok for r in results], [True, False, True, True, True])
+                self.assertIn("exited unexpectedly", results[1].error)
+                # existing outputs are skipped unless overwrite is requested
+                results = pool.convert(svg_files[:1])
+                self.assertTrue(results[0].skipped)
+                results = pool.convert(svg_files[:1], overwrite=True)
+                self.assertFalse(results[0].skipped)
+            for svg_file in svg_files:
+                self.assertEqual(svg_file.with_suffix('.pdf').exists(), 'crash' not in svg_file.name)
+
+
+class TestBatchConversion(unittest.TestCase):
+
+    def test_svg_to_pdf_many(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            svg_files = make_svg_files(tmpdir, ['m1.svg', 'crash.svg', 'm2.svg'])
+            progress = []
+            errors = []
+            results = render.svg_to_pdf_many(svg_files, workers=2, formats=('pdf', 'png'),
+                                             on_progress=lambda r, done, total: progress.append((done, total)),
+                                             on_error=errors.append, inkscape_path=FAKE_INKSCAPE)
+            self.assertEqual([(r.source, Path(r.output).suffix) for r in results],
+                             [(f, ext) for f in svg_files for ext in ('.pdf', '.png')])
+            self.assertEqual([r.ok for r in results], [True, True, False, False, True, True])
+            self.assertEqual(sorted(progress), [(i, 6) for i in range(1, 7)])
+            self.assertEqual({r.source for r in errors}, {svg_files[1]})
+            # up-to-date outputs are skipped, outdated ones are converted again
+            os.utime(svg_files[0], ns=(0, svg_files[0].with_suffix('.pdf').stat().st_mtime_ns + 10**9))
+            results = render.svg_to_pdf_many(svg_files[::2], workers=2, inkscape_path=FAKE_INKSCAPE)
+            self.assertEqual([r.skipped for r in results], [False, True])
+
+
+class TestConversionCache(unittest.TestCase):
+
+    def test_cached_conversion(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ConversionCache(Path(tmpdir) / 'cache')
+            a, b = make_svg_files(tmpdir, ['a.svg', 'b.svg'])
+            self.assertFalse(render.svg_to_pdf(a, inkscape_path=FAKE_INKSCAPE, cache=cache).cached)
+            # same content, same options -> Inkscape is not run
+            with mock.patch.object(render.subprocess, 'run', side_effect=AssertionError("Inkscape was run")):
+                result = render.svg_to_pdf(b, inkscape_path=FAKE_INKSCAPE, cache=cache)
+            self.assertTrue(result.cached)
+            self.assertEqual(b.with_suffix('.pdf').read_bytes(), a.with_suffix('.pdf').read_bytes())
+            # different export options
+            self.assertFalse(render.svg_export(a, inkscape_path=FAKE_INKSCAPE, export_area_drawing=False, cache=cache).cached)
+            # different content
+            c = Canvas(a)
+            c.layer('Layer 1').circle((0, 0), 5)
+            c.render(a, overwrite=True, cache=cache)
+            self.assertFalse(render.svg_to_pdf(a, overwrite=True, inkscape_path=FAKE_INKSCAPE, cache=cache).cached)
+            self.assertEqual((cache.stats.hits, cache.stats.misses, cache.stats.stores), (1, 3, 3))
+            self.assertAlmostEqual(cache.stats.hit_rate, 0.25)
+
+    def test_render_unchanged(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ConversionCache(Path(tmpdir) / 'cache')
+            output = Path(tmpdir) / 'output.svg'
+            c = Canvas(TEST_GRAPHIC)
+            c.render(output, cache=cache)
+            os.utime(output, ns=(0, 10**9))
+            c.render(output, overwrite=True, cache=cache)
+            self.assertEqual(output.stat().st_mtime_ns, 10**9)
+            self.assertEqual(cache.stats.unchanged_writes, 1)
+            c.layer('Layer 1').circle((0, 0), 5)
+            c.render(output, overwrite=True, cache=cache)
+            self.assertNotEqual(output.stat().st_mtime_ns, 10**9)
+            self.assertEqual([l.ID for l in Canvas(output, use_cache=False).layers()], [l.ID for l in c.layers()])
+
+    def test_eviction_and_hardlinks(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            svg_files = make_svg_files(tmpdir, ['a.svg', 'b.svg', 'c.svg'])
+            for idx, svg_file in enumerate(svg_files):
+                with open(svg_file, 'a') as outfile:
+                    outfile.write(f"<!-- {idx} -->")
+            entry_size = len(b'%FAKE-PDF\n') + svg_files[0].stat().st_size
+            cache = ConversionCache(Path(tmpdir) / 'cache', max_bytes=entry_size * 2, hardlink=True)
+            for svg_file in svg_files:
+                render.svg_to_pdf(svg_file, inkscape_path=FAKE_INKSCAPE, cache=cache)
+            self.assertEqual(cache.stats.evictions, 1)
+            self.assertLessEqual(cache.size, entry_size * 2)
+            svg_files[2].with_suffix('.pdf').unlink()
+            self.assertTrue(render.svg_to_pdf(svg_files[2], inkscape_path=FAKE_INKSCAPE, cache=cache).cached)
+            self.assertEqual(svg_files[2].with_suffix('.pdf').stat().st_nlink, 2)
+            cache.clear()
+            self.assertEqual(cache.size, 0)
+
+    def test_hardlinked_output_is_not_rewritten(self):
+        exports = {'cli': lambda svg: render.svg_export(svg, inkscape_path=FAKE_INKSCAPE),
+                   'async': lambda svg: asyncio.run(aio.svg_export(svg, inkscape_path=FAKE_INKSCAPE))}
+        with render.InkscapeShell(FAKE_INKSCAPE) as shell:
+            exports['shell'] = lambda svg: shell.export(svg, svg.with_suffix('.pdf'))
+            for name, export in exports.items():
+                with self.subTest(name), tempfile.TemporaryDirectory() as tmpdir:
+                    cache = ConversionCache(Path(tmpdir) / 'cache', hardlink=True)
+                    a, b, c = make_svg_files(tmpdir, ['a.svg', 'b.svg', 'c.svg'])
+                    render.svg_to_pdf(a, inkscape_path=FAKE_INKSCAPE, cache=cache)
+                    self.assertTrue(render.svg_to_pdf(b, inkscape_path=FAKE_INKSCAPE, cache=cache).cached)
+                    self.assertEqual(b.with_suffix('.pdf').stat().st_nlink, 2)
+                    # a new conversion of b must not change the cached output of a
+                    with open(b, 'a') as outfile:
+                        outfile.write("<!-- changed -->")
+                    self.assertTrue(export(b))
+                    self.assertTrue(b.with_suffix('.pdf').read_bytes().endswith(b"<!-- changed -->"))
+                    self.assertTrue(render.svg_to_pdf(c, inkscape_path=FAKE_INKSCAPE, cache=cache).cached)
+                    self.assertEqual(c.with_suffix('.pdf').read_bytes(), a.with_suffix('.pdf').read_bytes())
+
+
+class TestAsyncAPI(unittest.TestCase):
+
+    def test_convert_many(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            svg_files = make_svg_files(tmpdir, [f'a{idx}.svg' for idx in range(6)] + ['crash.svg'])
+            converter = aio.AsyncConverter(workers=3, inkscape_path=FAKE_INKSCAPE)
+            progress = []
+            results = asyncio.run(converter.convert_many(svg_files, on_progress=lambda r, done, total: progress.append(done)))
+            self.assertEqual([r.ok for r in results], [True] * 6 + [False])
+            self.assertEqual(sorted(progress), list(range(1, 8)))
+            self.assertTrue(svg_files[0].with_suffix('.pdf').read_bytes().startswith(b'%FAKE-PDF'))
+            results = asyncio.run(converter.convert_many(svg_files[:2]))
+            self.assertEqual([r.skipped for r in results], [True, True])
+            result = asyncio.run(aio.svg_to_pdf(svg_files[0], overwrite=True, inkscape_path=FAKE_INKSCAPE))
+            self.assertTrue(result)
+
+    def test_timeout_and_cancel(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            slow_file, = make_svg_files(tmpdir, ['slow.svg'])
+            start = time.perf_counter()
+            result = asyncio.run(aio.svg_export(slow_file, inkscape_path=FAKE_INKSCAPE, timeout=0.5))
+            self.assertFalse(result)
+            self.assertIn("0.5 seconds", result.error)
+
+            async def cancel_export():
+                task = asyncio.ensure_future(aio.svg_export(slow_file, inkscape_path=FAKE_INKSCAPE))
+                await asyncio.sleep(0.5)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            asyncio.run(cancel_export())
+            self.assertLess(time.perf_counter() - start, 5)
+            self.assertFalse(slow_file.with_suffix('.pdf').exists())
+
+    def test_render_and_merge(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            c = Canvas(TEST_GRAPHIC)
+            output = Path(tmpdir) / 'output.svg'
+            asyncio.run(aio.render(c, output))
+            self.assertEqual([l.ID for l in Canvas(output, use_cache=False).layers()], [l.ID for l in c.layers()])
+            inputs = []
+            for idx in range(3):
+                inputs.append(Path(tmpdir) / f"page{idx}.pdf")
+                inputs[-1].write_text(f"{idx};")
+            with mock.patch.object(render, '_merge_files', side_effect=fake_merge_files):
+                stats = asyncio.run(aio.merge_pdf(Path(tmpdir) / 'merged.pdf', inputs))
+            self.assertEqual(stats.inputs, 3)
+            self.assertEqual((Path(tmpdir) / 'merged.pdf').read_text(), "0;1;2;")
+
+
+def build_badge(canvas, record):
+    if record == 'broken':
+        raise ValueError("broken record")
+    layer = canvas.layer('Layer 1')
+    layer.text(record, (100, 100))
+    layer.circle((50, 50), 10)
+
+
+class TestGenerateMany(unittest.TestCase):
+
+    def test_generate_many(self):
+        records = ['Alice', 'Bob', 'broken', 'Carol']
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, '{index}_{record}.svg')
+            results = generate_many(TEST_GRAPHIC, records, build_badge, output_path, workers=2,
+                                    to_pdf=True, inkscape_path=FAKE_INKSCAPE)
+            self.assertEqual([r.ok for r in results], [True, True, False, True])
+            self.assertIn("broken record", results[2].error)
+            self.assertTrue(Path(tmpdir, '3_Carol.pdf').read_bytes().startswith(b'%FAKE-PDF'))
+            # IDs only depend on the document, not on the worker process
+            ids = [[e.get('id') for e in Canvas(r.output).layer('Layer 1').elem[-2:]] for r in results if r.ok]
+            self.assertEqual(ids, [ids[0]] * 3)
+            bob = Path(results[1].output).read_bytes()
+            sequential = generate_many(Canvas(TEST_GRAPHIC), records[:2], build_badge, output_path,
+                                       workers=1, overwrite=True)
+            self.assertEqual([r.ok for r in sequential], [True, True])
+            self.assertEqual(Path(sequential[1].output).read_bytes(), bob)
+            skipped = generate_many(TEST_GRAPHIC, records[:2], build_badge, output_path, workers=1)
+            self.assertEqual([r.skipped for r in skipped], [True, True])
+
+
+def fake_merge_files(output_path, input_paths, use_pypdf=True):
+    ''' Concatenate text files, standing in for PDF merging '''
+    with open(output_path, 'w') as outfile:
+        outfile.write(''.join(Path(p).read_text() for p in input_paths))
+
+
+class TestMergePDF(unittest.TestCase):
+
+    def test_tree_merge(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            def inputs():
+                for idx in range(10):
+                    path = Path(tmpdir) / f"page{idx}.pdf"
+                    path.write_text(f"{idx};")
+                    yield path
+            output_path = Path(tmpdir) / "merged.pdf"
+            with mock.patch.object(render, '_merge_files', side_effect=fake_merge_files) as merge_files:
+                stats = render.merge_pdf(output_path, inputs(), chunk_size=3, tmp_dir=tmpdir)
+                self.assertTrue(all(len(call.args[1]) <= 3 for call in merge_files.call_args_list))
+            self.assertEqual(output_path.read_text(), ''.join(f"{idx};" for idx in range(10)))
+            # 10 inputs -> 4 intermediate files -> 2 intermediate files -> output
+            self.assertEqual((stats.inputs, stats.merges, stats.levels), (10, 7, 2))
+            self.assertGreater(stats.throughput, 0)
+            # intermediate files are removed
+            self.assertEqual(sorted(p.name for p in Path(tmpdir).iterdir()),
+                             sorted([f"page{idx}.pdf" for idx in range(10)] + ["merged.pdf"]))
+
+    def test_pdfunite_fallback(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            inputs = [Path(tmpdir) / f"page{idx}.pdf" for idx in range(10)]
+            with mock.patch.object(render, '_pdf_merger_class', return_value=None), \
+                    mock.patch.object(render.platform, 'system', return_value='Linux'), \
+                    mock.patch.object(render.subprocess, 'run', side_effect=lambda args: Path(args[-1]).touch()) as run, \
+                    self.assertLogs(render.getLogger(), level='WARNING') as logs:
+                render.merge_pdf(Path(tmpdir) / "merged.pdf", inputs, chunk_size=3, tmp_dir=tmpdir)
+            self.assertEqual(run.call_count, 7)
+            self.assertTrue(all(call.args[0][0] == 'pdfunite' for call in run.call_args_list))
+            self.assertEqual(len([r for r in logs.records if 'PyPDF2' in r.getMessage()]), 1)
+
+
+# -------------------------------------------------------------------------------
+# MAIN
+# -------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()